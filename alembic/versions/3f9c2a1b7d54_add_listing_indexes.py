@@ -0,0 +1,45 @@
+"""Add listing indexes
+
+Revision ID: 3f9c2a1b7d54
+Revises: 77d4ae67dc40
+Create Date: 2026-10-18 09:12:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a1b7d54'
+down_revision: Union[str, None] = '77d4ae67dc40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sites_installation_date_id', 'sites', ['installation_date', 'id'])
+    op.create_index(
+        'ix_sites_country_installation_date_id', 'sites', ['country', 'installation_date', 'id']
+    )
+    op.create_index('ix_sites_max_power_megawatt_id', 'sites', ['max_power_megawatt', 'id'])
+    op.create_index('ix_sites_min_power_megawatt_id', 'sites', ['min_power_megawatt', 'id'])
+    op.create_index(
+        'ix_site_group_association_group_id_site_id',
+        'site_group_association',
+        ['group_id', 'site_id'],
+    )
+    op.create_index('ix_groups_name', 'groups', ['name'])
+    op.create_index('ix_groups_type_id', 'groups', ['type', 'id'])
+    op.create_index('ix_groups_parent_id', 'groups', ['parent_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_groups_parent_id', table_name='groups')
+    op.drop_index('ix_groups_type_id', table_name='groups')
+    op.drop_index('ix_groups_name', table_name='groups')
+    op.drop_index('ix_site_group_association_group_id_site_id', table_name='site_group_association')
+    op.drop_index('ix_sites_min_power_megawatt_id', table_name='sites')
+    op.drop_index('ix_sites_max_power_megawatt_id', table_name='sites')
+    op.drop_index('ix_sites_country_installation_date_id', table_name='sites')
+    op.drop_index('ix_sites_installation_date_id', table_name='sites')
@@ -0,0 +1,46 @@
+"""Add change feed
+
+Revision ID: 4b8e0c2d7f15
+Revises: 9d3f1b8e2a60
+Create Date: 2026-10-18 15:02:44.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8e0c2d7f15'
+down_revision: Union[str, None] = '9d3f1b8e2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'changes',
+        sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('country', sa.String(), nullable=True),
+        sa.Column(
+            'group_ids', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False
+        ),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index(op.f('ix_changes_created_at'), 'changes', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_changes_created_at'), table_name='changes')
+    op.drop_table('changes')
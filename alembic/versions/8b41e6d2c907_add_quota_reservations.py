@@ -0,0 +1,50 @@
+"""Add quota reservations
+
+Revision ID: 8b41e6d2c907
+Revises: 3f9c2a1b7d54
+Create Date: 2026-10-18 10:02:17.504391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41e6d2c907'
+down_revision: Union[str, None] = '3f9c2a1b7d54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'quota_reservations',
+        sa.Column('rule', sa.String(), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('slot', sa.Integer(), nullable=False),
+        sa.Column('site_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('rule', 'period_start', 'slot')
+    )
+    op.create_index('ix_quota_reservations_site_id', 'quota_reservations', ['site_id'])
+
+    # Existing French sites keep their slots; days that already hold several sites get
+    # one slot per site so that no new site can be added to them
+    op.execute(
+        """
+        INSERT INTO quota_reservations (rule, period_start, slot, site_id)
+        SELECT 'fr_daily_installations',
+               installation_date,
+               row_number() OVER (PARTITION BY installation_date ORDER BY id) - 1,
+               id
+        FROM sites
+        WHERE country = 'FR'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_quota_reservations_site_id', table_name='quota_reservations')
+    op.drop_table('quota_reservations')
@@ -0,0 +1,36 @@
+"""Cascade deletes to memberships and child groups
+
+Revision ID: 9d3f1b8e2a60
+Revises: e2a9d4c61b37
+Create Date: 2026-10-18 14:22:51.306417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f1b8e2a60'
+down_revision: Union[str, None] = 'e2a9d4c61b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOREIGN_KEYS = (
+    # constraint, table, column, referred table
+    ('site_group_association_site_id_fkey', 'site_group_association', 'site_id', 'sites'),
+    ('site_group_association_group_id_fkey', 'site_group_association', 'group_id', 'groups'),
+    ('groups_parent_id_fkey', 'groups', 'parent_id', 'groups'),
+)
+
+
+def upgrade() -> None:
+    for name, table, column, referred in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    for name, table, column, referred in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred, [column], ['id'])
@@ -0,0 +1,40 @@
+"""Add name search indexes
+
+Revision ID: a7c31e9f4d02
+Revises: 4b8e0c2d7f15
+Create Date: 2026-10-18 16:10:27.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c31e9f4d02'
+down_revision: Union[str, None] = '4b8e0c2d7f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('sites', 'groups')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in TABLES:
+        op.create_index(
+            f'ix_{table}_name_trgm',
+            table,
+            ['name'],
+            postgresql_using='gist',
+            postgresql_ops={'name': 'gist_trgm_ops'},
+        )
+        op.create_index(f'ix_{table}_name_lower', table, [sa.text('(lower(name) COLLATE "C")')])
+
+
+def downgrade() -> None:
+    # The extension is left in place, other objects may depend on it
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_name_lower', table_name=table)
+        op.drop_index(f'ix_{table}_name_trgm', table_name=table)
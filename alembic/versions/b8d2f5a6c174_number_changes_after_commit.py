@@ -0,0 +1,46 @@
+"""Number changes after they commit
+
+Revision ID: b8d2f5a6c174
+Revises: f3b7c1e84a29
+Create Date: 2026-10-18 19:48:05.127390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2f5a6c174'
+down_revision: Union[str, None] = 'f3b7c1e84a29'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Writers take an id from a sequence; the change feed fills in seq once they commit
+    op.execute('ALTER TABLE changes ADD COLUMN id BIGSERIAL')
+    op.drop_constraint('changes_pkey', 'changes', type_='primary')
+    op.create_primary_key('changes_pkey', 'changes', ['id'])
+    op.execute('ALTER TABLE changes ALTER COLUMN seq DROP DEFAULT')
+    op.execute('DROP SEQUENCE changes_seq_seq')
+    op.alter_column('changes', 'seq', existing_type=sa.BigInteger(), nullable=True)
+    op.create_index('ix_changes_seq', 'changes', ['seq'], unique=True)
+    op.create_index(
+        'ix_changes_pending', 'changes', ['id'], postgresql_where=sa.text('seq IS NULL')
+    )
+
+
+def downgrade() -> None:
+    # Changes not numbered yet have not reached any subscriber
+    op.execute('DELETE FROM changes WHERE seq IS NULL')
+    op.drop_index('ix_changes_pending', table_name='changes')
+    op.drop_index('ix_changes_seq', table_name='changes')
+    op.alter_column('changes', 'seq', existing_type=sa.BigInteger(), nullable=False)
+    op.execute('CREATE SEQUENCE changes_seq_seq OWNED BY changes.seq')
+    op.execute("SELECT setval('changes_seq_seq', coalesce(max(seq), 0) + 1, false) FROM changes")
+    op.execute("ALTER TABLE changes ALTER COLUMN seq SET DEFAULT nextval('changes_seq_seq')")
+    op.drop_constraint('changes_pkey', 'changes', type_='primary')
+    op.create_primary_key('changes_pkey', 'changes', ['seq'])
+    op.drop_column('changes', 'id')
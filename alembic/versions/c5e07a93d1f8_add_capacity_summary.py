@@ -0,0 +1,77 @@
+"""Add capacity summary
+
+Revision ID: c5e07a93d1f8
+Revises: 8b41e6d2c907
+Create Date: 2026-10-18 11:41:08.219573
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e07a93d1f8'
+down_revision: Union[str, None] = '8b41e6d2c907'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'capacity_summary',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('site_count', sa.Integer(), nullable=False),
+        sa.Column('max_power_megawatt', sa.Float(), nullable=False),
+        sa.Column('min_power_megawatt', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'key')
+    )
+
+    # Backfill from the existing sites, the API keeps the rows up to date from here on
+    op.execute(
+        """
+        INSERT INTO capacity_summary
+        SELECT 'country', country::text, count(*),
+               coalesce(sum(max_power_megawatt), 0), coalesce(sum(min_power_megawatt), 0)
+        FROM sites
+        GROUP BY country
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO capacity_summary
+        SELECT 'month', to_char(installation_date, 'YYYY-MM'), count(*),
+               coalesce(sum(max_power_megawatt), 0), coalesce(sum(min_power_megawatt), 0)
+        FROM sites
+        GROUP BY 2
+        """
+    )
+    op.execute(
+        """
+        WITH RECURSIVE tree(root_id, id, depth) AS (
+            SELECT id, id, 0 FROM groups
+            UNION ALL
+            SELECT tree.root_id, groups.id, tree.depth + 1
+            FROM groups JOIN tree ON groups.parent_id = tree.id
+            WHERE tree.depth < 100
+        ),
+        members AS (
+            SELECT DISTINCT tree.root_id, site_group_association.site_id
+            FROM tree
+            JOIN site_group_association ON site_group_association.group_id = tree.id
+        )
+        INSERT INTO capacity_summary
+        SELECT 'group', members.root_id::text, count(*),
+               coalesce(sum(sites.max_power_megawatt), 0),
+               coalesce(sum(sites.min_power_megawatt), 0)
+        FROM members
+        JOIN sites ON sites.id = members.site_id
+        GROUP BY members.root_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('capacity_summary')
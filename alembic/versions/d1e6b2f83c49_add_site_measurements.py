@@ -0,0 +1,37 @@
+"""Add site measurements
+
+Revision ID: d1e6b2f83c49
+Revises: a7c31e9f4d02
+Create Date: 2026-10-18 17:03:12.551870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e6b2f83c49'
+down_revision: Union[str, None] = 'a7c31e9f4d02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only the partitioned parent; the daily partitions are managed by the application
+    op.create_table(
+        'site_measurements',
+        sa.Column('site_id', sa.Integer(), nullable=False),
+        sa.Column('measured_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('power_megawatt', sa.Float(), nullable=False),
+        sa.Column('energy_megawatt_hour', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['site_id'], ['sites.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('site_id', 'measured_at'),
+        postgresql_partition_by='RANGE (measured_at)',
+    )
+
+
+def downgrade() -> None:
+    # Drops the partitions along with the parent
+    op.drop_table('site_measurements')
@@ -0,0 +1,29 @@
+"""Make group names unique
+
+Revision ID: e2a9d4c61b37
+Revises: c5e07a93d1f8
+Create Date: 2026-10-18 13:05:44.871206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9d4c61b37'
+down_revision: Union[str, None] = 'c5e07a93d1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The API already rejects duplicate names; the unique index lets bulk upserts resolve
+    # conflicts on the name. Duplicates loaded around the API make this step fail.
+    op.drop_index('ix_groups_name', table_name='groups')
+    op.create_index('ix_groups_name', 'groups', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_groups_name', table_name='groups')
+    op.create_index('ix_groups_name', 'groups', ['name'])
@@ -0,0 +1,52 @@
+"""Store site countries and group types as varchar
+
+Revision ID: f3b7c1e84a29
+Revises: d1e6b2f83c49
+Create Date: 2026-10-18 19:12:37.406518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7c1e84a29'
+down_revision: Union[str, None] = 'd1e6b2f83c49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ENUM_COLUMNS = (
+    # table, column, enum type, nullable
+    ('sites', 'country', sa.Enum('FR', 'IT', name='country_enum'), False),
+    ('groups', 'type', sa.Enum('GROUP1', 'GROUP2', 'GROUP3', name='group_type'), True),
+)
+
+
+def upgrade() -> None:
+    # The models declare plain strings, which queries bind and cast as varchar; the schemas
+    # still restrict the values. The indexes on these columns are rebuilt along the way.
+    for table, column, enum, nullable in ENUM_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.String(),
+            existing_type=enum,
+            existing_nullable=nullable,
+            postgresql_using=f'{column}::text',
+        )
+        enum.drop(op.get_bind())
+
+
+def downgrade() -> None:
+    for table, column, enum, nullable in ENUM_COLUMNS:
+        enum.create(op.get_bind())
+        op.alter_column(
+            table,
+            column,
+            type_=enum,
+            existing_type=sa.String(),
+            existing_nullable=nullable,
+            postgresql_using=f'{column}::{enum.name}',
+        )
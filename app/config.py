@@ -16,6 +16,8 @@
 #     return settings()
 #
 # config.py
+from typing import List, Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -24,6 +26,94 @@ class Settings(BaseSettings):
     postgres_user: str
     postgres_password: str
 
+    # Connection pool
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    # asyncpg's own statement cache and SQLAlchemy's prepared statement cache; set both to 0
+    # and enable db_pgbouncer_compat when running behind pgbouncer in transaction mode
+    db_statement_cache_size: int = 100
+    db_prepared_statement_cache_size: int = 100
+    db_pgbouncer_compat: bool = False
+    # Read replicas, as a JSON list of URLs; GET handlers read from them
+    db_replica_urls: List[str] = []
+    # Replicas further behind than this are skipped until they catch up
+    db_replica_max_lag_seconds: float = 5.0
+    db_replica_check_interval: float = 5.0
+    # After a write, the client's reads stay on the primary for this long
+    db_read_your_writes_seconds: float = 5.0
+    # Pooled connections opened and primed with the hot read statements at startup; unset
+    # warms the whole pool
+    db_pool_warm_connections: Optional[int] = None
+    # SQL logging, off by default; the sample rate keeps it affordable under load
+    db_echo: bool = False
+    db_echo_sample_rate: float = 1.0
+
+    # What startup does about the schema: "create" runs create_all (local development),
+    # "check" refuses to start unless the database is at the latest Alembic revision
+    startup_schema: Literal["create", "check"] = "create"
+
+    # Admission control: requests of each route class running at once, how many more may
+    # queue for a slot and for how long before getting a 503; the defaults add up to the
+    # primary's pool (db_pool_size + db_max_overflow) less the connection the change feed
+    # keeps checked out to listen
+    admission_enabled: bool = True
+    admission_read_concurrency: int = 7
+    admission_read_queue: int = 200
+    admission_write_concurrency: int = 4
+    admission_write_queue: int = 50
+    admission_bulk_concurrency: int = 2
+    admission_bulk_queue: int = 4
+    admission_export_concurrency: int = 1
+    admission_export_queue: int = 2
+    admission_queue_timeout_seconds: float = 5.0
+
+    # Responses of POST/PATCH requests sent with an Idempotency-Key header, replayed to
+    # retries with the same key on any worker; each worker also caches max_entries of them.
+    # A key is claimed for at most lease_seconds while its request runs, and duplicates on
+    # other workers poll for the response every poll_seconds
+    idempotency_max_entries: int = 10000
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_lease_seconds: float = 300.0
+    idempotency_poll_seconds: float = 0.2
+
+    # Requests slower than this many seconds log their SQL statements; unset disables it
+    metrics_slow_request_seconds: Optional[float] = None
+
+    # Read-through cache for single site/group reads
+    cache_max_entries: int = 10000
+    cache_ttl_seconds: float = 60.0
+
+    # Site/group lookups arriving within this window are merged into one query
+    loader_window_seconds: float = 0.002
+    loader_max_batch_size: int = 500
+
+    # Change feed: new changes are picked up on NOTIFY, or after poll_seconds at the latest.
+    # Idle streams get a heartbeat, subscribers further behind than max_queued are dropped
+    # and changes older than the retention can no longer be resumed from
+    change_feed_poll_seconds: float = 1.0
+    change_feed_heartbeat_seconds: float = 15.0
+    change_feed_max_queued: int = 1000
+    change_feed_retention_hours: float = 24.0
+
+    # Site telemetry: one partition per day, created days_ahead days in advance and dropped
+    # after retention_days; readings outside that window are rejected
+    telemetry_retention_days: int = 30
+    telemetry_days_ahead: int = 3
+    telemetry_maintenance_interval_seconds: float = 3600.0
+
+    # In-memory columnar copy of the sites answering the site list and count queries. Each
+    # worker holds its own, kept current by the write handlers and the change feed, and
+    # rebuilds it from scratch every rebuild_seconds
+    fleet_snapshot_enabled: bool = False
+    fleet_snapshot_rebuild_seconds: float = 3600.0
+
+    # Energy curves over more than this many sites x setpoints run in a process pool
+    energy_curve_offload_cells: int = 2_000_000
+    energy_curve_workers: Optional[int] = None
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest request in the running average of how long a slot is held
+HOLD_SECONDS_SMOOTHING = 0.1
+
+
+class OverloadedError(Exception):
+    """
+    A request was turned away by an ``AdmissionLimit``; ``retry_after`` is the number of
+    seconds the client should wait before trying again.
+    """
+
+    def __init__(self, limit: str, reason: str, retry_after: int):
+        super().__init__(f"{limit} requests are over capacity: {reason}")
+        self.limit = limit
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimit:
+    """
+    Lets at most ``concurrency`` requests of one route class run at once.
+
+    Up to ``max_queue`` more wait for a slot, first come first served, for at most
+    ``timeout_seconds``; requests arriving at a full queue, and waiters whose deadline
+    passes, get ``OverloadedError`` instead of piling up behind the connection pool.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, timeout_seconds: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.hold_seconds = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the requests already waiting are likely to have gone through.
+        """
+        backlog = (len(self._waiters) + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(self.hold_seconds * backlog))
+
+    async def acquire(self) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise OverloadedError(self.name, "queue is full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout_seconds)
+        except BaseException as e:
+            # The slot may have been handed over just as the deadline passed or the client
+            # went away; give it to the next waiter
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_timeout += 1
+                reason = "timed out in the queue"
+                raise OverloadedError(self.name, reason, self.retry_after()) from None
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        waited = time.perf_counter() - start
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def release(self) -> None:
+        # The slot goes straight to the oldest waiter, so a newcomer cannot take it first
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def record_hold(self, seconds: float) -> None:
+        self.hold_seconds += HOLD_SECONDS_SMOOTHING * (seconds - self.hold_seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+            "hold_seconds_avg": self.hold_seconds,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware holding each HTTP request in the ``AdmissionLimit`` of its route class,
+    as named by ``classify(method, path)``, from before the body is read until the last byte
+    of the response is sent, so streamed responses keep their slot. Requests ``classify``
+    returns None for are let through.
+
+    Turned away requests get a 503 with a ``Retry-After`` header, without reaching the
+    handler or its database session.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, AdmissionLimit],
+        classify: Callable[[str, str], Optional[str]],
+    ):
+        self.app = app
+        self.limits = limits
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http":
+            limit = self.limits.get(self.classify(scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except OverloadedError as e:
+            logger.debug("Rejected %s %s: %s", scope["method"], scope["path"], e)
+            response = JSONResponse(
+                {"detail": str(e)}, status_code=503, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.record_hold(time.perf_counter() - start)
+            limit.release()
@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Table, insert, literal_column, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def copy_rows(
+    db: AsyncSession, table: Table, columns: Sequence[str], records: Iterable[tuple]
+) -> None:
+    """
+    Writes ``records`` into ``table`` inside the session's current transaction.
+
+    On asyncpg the rows are streamed with ``COPY ... FROM STDIN``; other drivers fall back
+    to a multi-row INSERT.
+    """
+    records = list(records)
+    if not records:
+        return
+
+    conn = await db.connection()
+    if conn.dialect.driver == "asyncpg":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name, records=records, columns=list(columns)
+        )
+        return
+
+    rows = [dict(zip(columns, record, strict=True)) for record in records]
+    await conn.execute(insert(table), rows)
+
+
+async def upsert_rows(
+    db: AsyncSession,
+    table: Table,
+    rows: Sequence[Dict],
+    key: str,
+    update_columns: Sequence[str] = (),
+) -> Tuple[List[int], List[int]]:
+    """
+    Inserts ``rows`` into ``table``, resolving conflicts on the unique column ``key``.
+
+    Existing rows are left alone unless ``update_columns`` is given, in which case they are
+    updated only when one of those columns actually changes. Returns the ids of the created
+    and of the updated rows; every other row was skipped.
+    """
+    if not rows:
+        return [], []
+
+    stmt = postgresql.insert(table)
+    if update_columns:
+        current = tuple_(*(table.c[column] for column in update_columns))
+        incoming = tuple_(*(stmt.excluded[column] for column in update_columns))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[key]],
+            set_={column: stmt.excluded[column] for column in update_columns},
+            where=current.is_distinct_from(incoming),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c[key]])
+    # xmax is 0 on a freshly inserted row version and set on an updated one
+    stmt = stmt.returning(table.c.id, literal_column("xmax = 0").label("created"))
+
+    created, updated = [], []
+    for row_id, was_created in await db.execute(stmt, list(rows)):
+        (created if was_created else updated).append(row_id)
+    return created, updated
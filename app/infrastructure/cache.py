@@ -0,0 +1,135 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Set, Tuple
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire ``ttl`` seconds after being stored.
+
+    Entries can carry tags so that a write to one record drops every cached payload that
+    embeds it (e.g. a group change invalidates the sites listing that group).
+
+    Loads racing a write can pass the ``generation()`` taken before they started to ``set``,
+    which then drops the value if its key or one of its tags was invalidated in between,
+    instead of caching a row read before the write.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_sets = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._generation = 0
+        # Generation at which each recently invalidated key or tag was last invalidated; the
+        # ones forgotten to stay within ``maxsize`` raise the floor instead
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._floor = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= self.clock():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        generation: Optional[int] = None,
+    ) -> None:
+        tags = tuple(tags)
+        if generation is not None and not self._current(generation, key, tags):
+            self.stale_sets += 1
+            return
+        self._drop(key)
+        self._entries[key] = (value, self.clock() + self.ttl, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _current(self, generation: int, key: Hashable, tags: Tuple[Hashable, ...]) -> bool:
+        if generation < self._floor:
+            return False
+        return all(self._invalidated.get(name, 0) <= generation for name in (key, *tags))
+
+    def _bump(self, name: Hashable) -> None:
+        self._generation += 1
+        self._invalidated[name] = self._generation
+        self._invalidated.move_to_end(name)
+        while len(self._invalidated) > self.maxsize:
+            _, self._floor = self._invalidated.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._bump(key)
+        self._drop(key)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        self._bump(tag)
+        for key in list(self._tags.get(tag, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._floor = self._generation
+        self._invalidated.clear()
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_sets": self.stale_sets,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluates an ``If-None-Match`` header against the current strong ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,183 @@
+import asyncio
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy import String, cast, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure.hierarchy import ancestor_pairs_cte, descendant_pairs_cte
+from app.infrastructure.models.capacity import CapacitySummary
+from app.infrastructure.models.site import Site, site_group_association
+
+
+class SiteFacts(NamedTuple):
+    """
+    The values of a site that feed the capacity summaries.
+    """
+    country: str
+    installation_date: date
+    max_power_megawatt: float
+    min_power_megawatt: float
+    group_ids: Tuple[int, ...]
+
+
+def site_facts(site, group_ids: Iterable[int]) -> SiteFacts:
+    """
+    Builds the facts of an ORM ``Site`` or a ``SiteCreate`` payload.
+    """
+    return SiteFacts(
+        getattr(site.country, "value", site.country),
+        site.installation_date,
+        site.max_power_megawatt or 0.0,
+        site.min_power_megawatt or 0.0,
+        tuple(set(group_ids)),
+    )
+
+
+def _month(day: date) -> str:
+    return day.strftime("%Y-%m")
+
+
+async def apply_site_changes(
+    db: AsyncSession, removed: Sequence[SiteFacts] = (), added: Sequence[SiteFacts] = ()
+) -> None:
+    """
+    Applies the effect of removing and adding sites to the summaries, as deltas.
+
+    A site counts once towards each of its groups and each of their ancestors, however many
+    of its groups share an ancestor. The covering groups are resolved with one recursive
+    query and all deltas are written with one ``INSERT ... ON CONFLICT DO UPDATE``.
+    """
+    group_ids = {group_id for facts in (*removed, *added) for group_id in facts.group_ids}
+    covering: Dict[int, set] = defaultdict(set)
+    if group_ids:
+        pairs = ancestor_pairs_cte(group_ids)
+        result = await db.execute(select(pairs.c.start_id, pairs.c.id))
+        for start_id, ancestor_id in result:
+            covering[start_id].add(ancestor_id)
+
+    deltas: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    for sign, sites in ((-1, removed), (1, added)):
+        for facts in sites:
+            groups = set().union(*(covering[group_id] for group_id in facts.group_ids))
+            keys = [("country", facts.country), ("month", _month(facts.installation_date))]
+            keys.extend(("group", str(group_id)) for group_id in groups)
+            for key in keys:
+                delta = deltas[key]
+                delta[0] += sign
+                delta[1] += sign * facts.max_power_megawatt
+                delta[2] += sign * facts.min_power_megawatt
+
+    rows = [
+        {
+            "dimension": dimension,
+            "key": key,
+            "site_count": count,
+            "max_power_megawatt": max_power,
+            "min_power_megawatt": min_power,
+        }
+        for (dimension, key), (count, max_power, min_power) in sorted(deltas.items())
+        if count or max_power or min_power
+    ]
+    if not rows:
+        return
+
+    stmt = insert(CapacitySummary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CapacitySummary.dimension, CapacitySummary.key],
+        set_={
+            "site_count": CapacitySummary.site_count + stmt.excluded.site_count,
+            "max_power_megawatt": CapacitySummary.max_power_megawatt
+            + stmt.excluded.max_power_megawatt,
+            "min_power_megawatt": CapacitySummary.min_power_megawatt
+            + stmt.excluded.min_power_megawatt,
+        },
+    )
+    await db.execute(stmt, rows)
+
+
+def _group_rollup(group_ids=None):
+    """
+    Distinct sites below each group (or the given groups), summed per group.
+    """
+    pairs = descendant_pairs_cte(group_ids)
+    members = (
+        select(pairs.c.root_id, site_group_association.c.site_id)
+        .join(site_group_association, site_group_association.c.group_id == pairs.c.id)
+        .distinct()
+        .subquery()
+    )
+    return (
+        select(
+            literal("group"),
+            cast(members.c.root_id, String),
+            func.count(),
+            func.coalesce(func.sum(Site.max_power_megawatt), 0.0),
+            func.coalesce(func.sum(Site.min_power_megawatt), 0.0),
+        )
+        .join(Site, Site.id == members.c.site_id)
+        .group_by(members.c.root_id)
+    )
+
+
+SUMMARY_COLUMNS = ("dimension", "key", "site_count", "max_power_megawatt", "min_power_megawatt")
+
+
+async def refresh_groups(db: AsyncSession, group_ids: Iterable[int]) -> None:
+    """
+    Recomputes the rollups of the given groups, e.g. after the hierarchy above their sites
+    changed, which cannot be expressed as per-site deltas.
+    """
+    group_ids = list(set(group_ids))
+    if not group_ids:
+        return
+    await db.execute(
+        delete(CapacitySummary).where(
+            CapacitySummary.dimension == "group",
+            CapacitySummary.key.in_([str(group_id) for group_id in group_ids]),
+        )
+    )
+    await db.execute(
+        insert(CapacitySummary).from_select(SUMMARY_COLUMNS, _group_rollup(group_ids))
+    )
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """
+    Recomputes every summary from the base tables, e.g. after a bulk load that bypassed the API.
+    """
+    await db.execute(delete(CapacitySummary))
+    totals = (
+        func.count(),
+        func.coalesce(func.sum(Site.max_power_megawatt), 0.0),
+        func.coalesce(func.sum(Site.min_power_megawatt), 0.0),
+    )
+    await db.execute(
+        insert(CapacitySummary).from_select(
+            SUMMARY_COLUMNS,
+            select(literal("country"), cast(Site.country, String), *totals).group_by(Site.country),
+        )
+    )
+    month = func.to_char(Site.installation_date, "YYYY-MM")
+    await db.execute(
+        insert(CapacitySummary).from_select(
+            SUMMARY_COLUMNS, select(literal("month"), month, *totals).group_by(month)
+        )
+    )
+    await db.execute(insert(CapacitySummary).from_select(SUMMARY_COLUMNS, _group_rollup()))
+
+
+async def _rebuild_command() -> None:
+    from app.infrastructure.models.db import async_session, engine
+
+    async with async_session() as session, session.begin():
+        await rebuild(session)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    # python -m app.infrastructure.capacity
+    asyncio.run(_rebuild_command())
@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.bulk import copy_rows
+from app.infrastructure.models.change import Change
+from app.schemas import ChangeEntity, ChangeOp
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel notified whenever changes commit; the payload is unused
+CHANNEL = "changes"
+# Transaction-level advisory lock serializing the feeds numbering committed changes
+LOCK_KEY = 0x6368616E67
+CHANGE_COLUMNS = ("entity", "entity_id", "op", "country", "group_ids")
+PUMP_BATCH_SIZE = 1000
+# Changes numbered per transaction, bounding how long the lock is held
+NUMBER_BATCH_SIZE = 10000
+PRUNE_INTERVAL_SECONDS = 3600.0
+
+
+async def record(
+    db: AsyncSession,
+    entity: ChangeEntity,
+    op: ChangeOp,
+    items: Iterable[Tuple[int, Optional[str], Iterable[Optional[int]]]],
+) -> None:
+    """
+    Records ``(id, country, group ids)`` changes within the session's transaction and
+    notifies the change feeds once it commits. Concurrent writers do not wait for each other:
+    the changes only get their sequence number from ``number_committed`` after the commit.
+    """
+    records = [
+        (
+            entity.value,
+            entity_id,
+            op.value,
+            country,
+            sorted({group_id for group_id in group_ids if group_id is not None}),
+        )
+        for entity_id, country, group_ids in items
+    ]
+    if not records:
+        return
+    await copy_rows(db, Change.__table__, CHANGE_COLUMNS, records)
+    await db.execute(select(func.pg_notify(CHANNEL, "")))
+
+
+async def number_committed(db: AsyncSession) -> int:
+    """
+    Gives the committed changes that have none the next sequence numbers, in the order they
+    were recorded, and returns how many were numbered; at most ``NUMBER_BATCH_SIZE`` per call.
+
+    Only committed rows are visible here, and the advisory lock makes each call see the
+    numbers of the previous one, so a reader that has seen a number has seen every change
+    below it. Writers never take the lock.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(LOCK_KEY)))
+    result = await db.execute(
+        text(
+            """
+            UPDATE changes
+            SET seq = numbered.seq
+            FROM (
+                SELECT pending.id,
+                       (SELECT coalesce(max(seq), 0) FROM changes)
+                       + row_number() OVER (ORDER BY pending.id) AS seq
+                FROM (
+                    SELECT id FROM changes WHERE seq IS NULL ORDER BY id LIMIT :limit
+                ) AS pending
+            ) AS numbered
+            WHERE changes.id = numbered.id
+            """
+        ),
+        {"limit": NUMBER_BATCH_SIZE},
+    )
+    if result.rowcount:
+        # Wakes the feeds of the other workers
+        await db.execute(select(func.pg_notify(CHANNEL, "")))
+    return result.rowcount
+
+
+def change_dict(change: Change) -> dict:
+    return {
+        "seq": change.seq,
+        "entity": change.entity,
+        "id": change.entity_id,
+        "op": change.op,
+        "country": change.country,
+        "group_ids": change.group_ids,
+        "at": change.created_at.isoformat(),
+    }
+
+
+class ChangeFilter:
+    """
+    What a subscriber wants to see. Country filters only match sites; group filters match
+    the sites in one of the groups and the changes to those groups or their children.
+    """
+
+    def __init__(
+        self,
+        entities: Optional[Iterable[ChangeEntity]] = None,
+        countries: Optional[Iterable[str]] = None,
+        group_ids: Optional[Iterable[int]] = None,
+    ):
+        self.entities = {entity.value for entity in entities} if entities else None
+        self.countries = set(countries) if countries else None
+        self.group_ids = set(group_ids) if group_ids else None
+
+    def matches(self, change: dict) -> bool:
+        if self.entities is not None and change["entity"] not in self.entities:
+            return False
+        if self.countries is not None and change["country"] not in self.countries:
+            return False
+        if self.group_ids is not None and self.group_ids.isdisjoint(change["group_ids"]):
+            return False
+        return True
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.entities is not None:
+            conditions.append(Change.entity.in_(self.entities))
+        if self.countries is not None:
+            conditions.append(Change.country.in_(self.countries))
+        if self.group_ids is not None:
+            conditions.append(Change.group_ids.overlap(sorted(self.group_ids)))
+        return conditions
+
+
+class Subscription:
+    def __init__(self, change_filter: ChangeFilter, max_queued: int):
+        self.filter = change_filter
+        self.queue: asyncio.Queue = asyncio.Queue(max_queued)
+
+
+class ChangeFeed:
+    """
+    Fans the committed changes out to this worker's subscribers.
+
+    One pump per worker reads the new rows of ``changes`` whenever a ``NOTIFY`` arrives, and
+    at least every ``poll_seconds`` in case one was missed, then queues every row on the
+    subscriptions it matches. A subscriber that falls ``max_queued`` changes behind is
+    dropped; it reconnects with its last sequence number and catches up from the table.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        session: sessionmaker,
+        poll_seconds: float = 1.0,
+        heartbeat_seconds: float = 15.0,
+        retention_seconds: float = 86400.0,
+        max_queued: int = 1000,
+    ):
+        self.engine = engine
+        self.session = session
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retention_seconds = retention_seconds
+        self.max_queued = max_queued
+        self.last_seq = 0
+        self._subscriptions: Set[Subscription] = set()
+        self._wake = asyncio.Event()
+        self._listener = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        async with self.session() as session:
+            self.last_seq = (await session.execute(select(func.max(Change.seq)))).scalar() or 0
+        await self._listen()
+        self._task = asyncio.create_task(self._pump())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._unlisten()
+        for subscription in list(self._subscriptions):
+            self._drop(subscription)
+
+    async def _listen(self) -> None:
+        # A dedicated connection, kept checked out for as long as it listens
+        connection = await self.engine.connect()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.add_listener(CHANNEL, self._notified)
+        self._listener = (connection, raw.driver_connection)
+
+    async def _unlisten(self) -> None:
+        if self._listener is None:
+            return
+        connection, driver_connection = self._listener
+        self._listener = None
+        try:
+            await driver_connection.remove_listener(CHANNEL, self._notified)
+        except Exception:
+            pass
+        await connection.close()
+
+    def _notified(self, *args) -> None:
+        self._wake.set()
+
+    async def _pump(self) -> None:
+        pruned_at = float("-inf")
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if self._listener is None or self._listener[1].is_closed():
+                    await self._unlisten()
+                    await self._listen()
+                await self._number_committed()
+                await self._publish_new()
+                if time.monotonic() - pruned_at > PRUNE_INTERVAL_SECONDS:
+                    pruned_at = time.monotonic()
+                    await self.prune()
+            except Exception as e:
+                logger.warning("Change feed pump failed, retrying: %s", e)
+
+    async def _number_committed(self) -> None:
+        while True:
+            async with self.session() as session, session.begin():
+                numbered = await number_committed(session)
+            if numbered < NUMBER_BATCH_SIZE:
+                return
+
+    async def _publish_new(self) -> None:
+        while True:
+            async with self.session() as session:
+                result = await session.execute(
+                    select(Change)
+                    .where(Change.seq > self.last_seq)
+                    .order_by(Change.seq)
+                    .limit(PUMP_BATCH_SIZE)
+                )
+                changes = [change_dict(change) for change in result.scalars()]
+            for change in changes:
+                self._publish(change)
+                self.last_seq = change["seq"]
+            if len(changes) < PUMP_BATCH_SIZE:
+                return
+
+    def _publish(self, change: dict) -> None:
+        self.published += 1
+        for subscription in list(self._subscriptions):
+            if not subscription.filter.matches(change):
+                continue
+            try:
+                subscription.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        # Ends the stream
+        subscription.queue.put_nowait(None)
+
+    async def prune(self) -> int:
+        """
+        Deletes the changes older than the retention period, always keeping the newest one
+        so ``horizon`` stays known.
+        """
+        async with self.session() as session, session.begin():
+            newest = select(func.max(Change.seq)).scalar_subquery()
+            result = await session.execute(
+                delete(Change).where(
+                    Change.created_at < func.now() - timedelta(seconds=self.retention_seconds),
+                    Change.seq < newest,
+                )
+            )
+        return result.rowcount
+
+    async def _replay(
+        self, change_filter: ChangeFilter, after: int
+    ) -> Tuple[Optional[int], List[dict]]:
+        async with self.session() as session:
+            oldest = (await session.execute(select(func.min(Change.seq)))).scalar()
+            if oldest is not None and after < oldest - 1:
+                return oldest - 1, []
+            result = await session.execute(
+                select(Change)
+                .where(Change.seq > after, *change_filter.conditions())
+                .order_by(Change.seq)
+                .limit(PUMP_BATCH_SIZE)
+            )
+            return None, [change_dict(change) for change in result.scalars()]
+
+    async def stream(
+        self, change_filter: ChangeFilter, after: Optional[int] = None
+    ) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields the matching changes after sequence number ``after`` (or from now on), then
+        every new one as it commits, and None after ``heartbeat_seconds`` without any.
+
+        A client resuming from changes that were already pruned gets one
+        ``{"op": "reset", "seq": ...}`` event instead: it has to resync, then carries on
+        from that sequence number.
+        """
+        subscription = Subscription(change_filter, self.max_queued)
+        # Subscribed before replaying, so nothing committed in between is missed
+        self._subscriptions.add(subscription)
+        try:
+            if after is not None:
+                while True:
+                    horizon, changes = await self._replay(change_filter, after)
+                    if horizon is not None:
+                        yield {"seq": horizon, "op": "reset"}
+                        after = horizon
+                        continue
+                    for change in changes:
+                        yield change
+                        after = change["seq"]
+                    if len(changes) < PUMP_BATCH_SIZE:
+                        break
+            while True:
+                try:
+                    change = await asyncio.wait_for(
+                        subscription.queue.get(), self.heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if change is None:
+                    return
+                if after is not None and change["seq"] <= after:
+                    continue
+                yield change
+        finally:
+            self._subscriptions.discard(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "last_seq": self.last_seq,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,119 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import ColumnElement, delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure import capacity
+from app.infrastructure.hierarchy import ancestor_pairs_cte, descendant_pairs_cte
+from app.infrastructure.models.capacity import CapacitySummary
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site, site_group_association
+from app.infrastructure.serialization import id_in
+from app.schemas import ChildPolicy
+
+
+class GroupHasChildrenError(Exception):
+    pass
+
+
+async def delete_sites(
+    db: AsyncSession, condition: ColumnElement
+) -> Dict[int, capacity.SiteFacts]:
+    """
+    Deletes the sites matching ``condition`` with one statement and returns their facts, by
+    id.
+
+    Memberships and quota reservations go with them through ``ON DELETE CASCADE``. The
+    statement runs as a CTE whose outer query still sees the memberships, so the capacity
+    summaries are updated without loading the sites first.
+    """
+    gone = (
+        delete(Site)
+        .where(condition)
+        .returning(
+            Site.id,
+            Site.country,
+            Site.installation_date,
+            Site.max_power_megawatt,
+            Site.min_power_megawatt,
+        )
+        .cte("gone")
+    )
+    group_ids = func.array(
+        select(site_group_association.c.group_id)
+        .where(site_group_association.c.site_id == gone.c.id)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(select(gone, group_ids))).all()
+    removed = {
+        site_id: capacity.SiteFacts(country, installed, high or 0.0, low or 0.0, tuple(groups))
+        for site_id, country, installed, high, low, groups in rows
+    }
+    await capacity.apply_site_changes(db, removed=removed.values())
+    return removed
+
+
+async def delete_groups(
+    db: AsyncSession, condition: ColumnElement, children: ChildPolicy
+) -> Tuple[Dict[int, Optional[int]], Dict[int, Optional[int]]]:
+    """
+    Deletes the groups matching ``condition`` with set-based statements and returns the
+    parent ids of the deleted groups and the new parent ids of the surviving child groups
+    that were moved, both by group id.
+
+    ``children`` decides what happens to child groups that do not match themselves:
+    ``restrict`` raises ``GroupHasChildrenError``, ``orphan`` turns them into roots, ``reparent``
+    moves them to the nearest surviving ancestor and ``cascade`` deletes whole subtrees.
+    """
+    group_ids = (await db.execute(select(Group.id).where(condition))).scalars().all()
+    if group_ids and children == ChildPolicy.CASCADE:
+        subtree = descendant_pairs_cte(group_ids)
+        group_ids = (await db.execute(select(subtree.c.id).distinct())).scalars().all()
+    if not group_ids:
+        return {}, {}
+    doomed = set(group_ids)
+
+    # The rollups above the deleted groups lose their sites, or their whole subtrees
+    chains = ancestor_pairs_cte(group_ids)
+    stale = (await db.execute(select(chains.c.id).distinct())).scalars().all()
+    stale = [group_id for group_id in stale if group_id not in doomed]
+
+    orphans = id_in(Group.parent_id, group_ids) & ~id_in(Group.id, group_ids)
+    moved = {}
+    if children == ChildPolicy.RESTRICT:
+        child = (await db.execute(select(Group.id).where(orphans).limit(1))).scalar()
+        if child is not None:
+            raise GroupHasChildrenError(f"Group {child} would be left without its parent")
+    elif children == ChildPolicy.ORPHAN:
+        result = await db.execute(
+            update(Group).where(orphans).values(parent_id=None).returning(Group.id)
+        )
+        moved = dict.fromkeys(result.scalars())
+    elif children == ChildPolicy.REPARENT:
+        # One level per pass, for children whose grandparent is being deleted as well
+        parent = Group.__table__.alias("parent")
+        while True:
+            result = await db.execute(
+                update(Group)
+                .where(orphans, Group.parent_id == parent.c.id)
+                .values(parent_id=parent.c.parent_id)
+                .returning(Group.id, Group.parent_id)
+            )
+            passed = result.all()
+            if not passed:
+                break
+            moved.update(passed)
+
+    result = await db.execute(
+        delete(Group).where(id_in(Group.id, group_ids)).returning(Group.id, Group.parent_id)
+    )
+    deleted = dict(result.all())
+    await db.execute(
+        delete(CapacitySummary).where(
+            CapacitySummary.dimension == "group",
+            CapacitySummary.key.in_([str(group_id) for group_id in group_ids]),
+        )
+    )
+    await capacity.refresh_groups(db, stale)
+    return deleted, moved
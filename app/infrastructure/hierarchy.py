@@ -0,0 +1,125 @@
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import CTE, literal
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.infrastructure.models.group import Group
+
+# Guards the recursive queries against cycles that may already exist in the data
+MAX_GROUP_DEPTH = 100
+
+T = TypeVar("T")
+
+
+class HierarchyCycleError(ValueError):
+    pass
+
+
+def parents_first(
+    items: Sequence[T],
+    id_of: Callable[[T], Hashable],
+    parent_of: Callable[[T], Optional[Hashable]],
+) -> List[T]:
+    """
+    Orders ``items`` so that every item comes after its parent when the parent is part of
+    ``items`` too, e.g. to insert a whole tree in one pass.
+
+    Raises ``HierarchyCycleError`` when the items reference each other in a loop.
+    """
+    by_id = {id_of(item): item for item in items}
+    children: Dict[int, List[T]] = {}
+    roots = []
+    for item in items:
+        parent = by_id.get(parent_of(item))
+        if parent is None:
+            roots.append(item)
+        else:
+            children.setdefault(id(parent), []).append(item)
+
+    ordered = []
+    pending = roots
+    while pending:
+        ordered.extend(pending)
+        pending = [child for item in pending for child in children.pop(id(item), [])]
+    if len(ordered) != len(items):
+        raise HierarchyCycleError("The groups reference each other in a cycle")
+    return ordered
+
+
+def descendants_cte(group_id: int) -> CTE:
+    """
+    Recursive CTE of ``(id, depth)`` rows for the group and every group below it.
+
+    The group itself is returned at depth 0. Each level is one probe of ``ix_groups_parent_id``.
+    """
+    tree = (
+        select(Group.id.label("id"), literal(0).label("depth"))
+        .where(Group.id == group_id)
+        .cte("descendants", recursive=True)
+    )
+    child = aliased(Group)
+    return tree.union_all(
+        select(child.id, tree.c.depth + 1).where(
+            child.parent_id == tree.c.id, tree.c.depth < MAX_GROUP_DEPTH
+        )
+    )
+
+
+def ancestors_cte(group_id: int) -> CTE:
+    """
+    Recursive CTE of ``(id, depth)`` rows for the group and every group above it.
+
+    The group itself is returned at depth 0, its parent at depth 1 and so on up to the root.
+    """
+    tree = (
+        select(Group.id.label("id"), Group.parent_id.label("parent_id"), literal(0).label("depth"))
+        .where(Group.id == group_id)
+        .cte("ancestors", recursive=True)
+    )
+    parent = aliased(Group)
+    return tree.union_all(
+        select(parent.id, parent.parent_id, tree.c.depth + 1).where(
+            parent.id == tree.c.parent_id, tree.c.depth < MAX_GROUP_DEPTH
+        )
+    )
+
+
+def ancestor_pairs_cte(group_ids: Iterable[int]) -> CTE:
+    """
+    Recursive CTE of ``(start_id, id)`` rows pairing each given group with itself and every
+    group above it.
+    """
+    tree = (
+        select(
+            Group.id.label("start_id"),
+            Group.id.label("id"),
+            Group.parent_id.label("parent_id"),
+            literal(0).label("depth"),
+        )
+        .where(Group.id.in_(list(group_ids)))
+        .cte("ancestor_pairs", recursive=True)
+    )
+    parent = aliased(Group)
+    return tree.union_all(
+        select(tree.c.start_id, parent.id, parent.parent_id, tree.c.depth + 1).where(
+            parent.id == tree.c.parent_id, tree.c.depth < MAX_GROUP_DEPTH
+        )
+    )
+
+
+def descendant_pairs_cte(group_ids: Optional[Iterable[int]] = None) -> CTE:
+    """
+    Recursive CTE of ``(root_id, id)`` rows pairing each given group (all groups when None)
+    with itself and every group below it.
+    """
+    anchor = select(Group.id.label("root_id"), Group.id.label("id"), literal(0).label("depth"))
+    if group_ids is not None:
+        anchor = anchor.where(Group.id.in_(list(group_ids)))
+    tree = anchor.cte("descendant_pairs", recursive=True)
+    child = aliased(Group)
+    return tree.union_all(
+        select(tree.c.root_id, child.id, tree.c.depth + 1).where(
+            child.parent_id == tree.c.id, tree.c.depth < MAX_GROUP_DEPTH
+        )
+    )
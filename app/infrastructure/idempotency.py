@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.cache import TTLCache
+from app.infrastructure.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+IDEMPOTENT_METHODS = frozenset({"POST", "PATCH"})
+MAX_KEY_LENGTH = 255
+# Client errors a retry may not get again, which are not stored
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429})
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: bytes
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class Holder(NamedTuple):
+    """
+    The request holding a key: its fingerprint, and its response once it completed.
+    """
+    fingerprint: bytes
+    response: Optional[StoredResponse]
+
+
+def _storable(status: int, headers: List[Tuple[bytes, bytes]]) -> bool:
+    # Only answers a retry would get again: no server error, nor a contention or overload
+    # answer telling the client to come back
+    if not 200 <= status < 300 and not 400 <= status < 500:
+        return False
+    if status in RETRYABLE_STATUSES:
+        return False
+    return all(name.lower() != b"retry-after" for name, _ in headers)
+
+
+class IdempotencyStore:
+    """
+    Responses of completed requests by ``(method, path, Idempotency-Key)``, shared by the
+    workers through the ``idempotency_keys`` table and purged ``ttl`` seconds after the key
+    was claimed.
+
+    A request claims its key before running and holds it for at most ``lease_seconds``; a
+    duplicate reaching another worker meanwhile polls the table every ``poll_seconds`` until
+    the response is stored. Each worker keeps the responses it has seen in a bounded cache,
+    and the requests it is running, so duplicates it receives wait without polling.
+    """
+
+    def __init__(
+        self,
+        session: sessionmaker,
+        maxsize: int,
+        ttl: float,
+        lease_seconds: float = 300.0,
+        poll_seconds: float = 0.2,
+        purge_interval_seconds: float = 3600.0,
+    ):
+        self.session = session
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self.responses = TTLCache(maxsize, ttl)
+        self.in_flight: Dict[tuple, Tuple[bytes, asyncio.Future]] = {}
+        self.claims = 0
+        self.replays = 0
+        self.waits = 0
+        self.mismatches = 0
+
+    @staticmethod
+    def _key_condition(store_key: tuple):
+        method, path, key = store_key
+        return and_(
+            IdempotencyKey.method == method,
+            IdempotencyKey.path == path,
+            IdempotencyKey.key == key,
+        )
+
+    async def claim(self, store_key: tuple, fingerprint: bytes, token: str) -> Optional[Holder]:
+        """
+        Claims the key for the request of ``fingerprint`` and returns None, unless another
+        request holds it: then returns that one, which may not have completed yet. Expired
+        keys and lapsed claims are taken over.
+        """
+        method, path, key = store_key
+        now = func.now()
+        stmt = insert(IdempotencyKey).values(
+            method=method,
+            path=path,
+            key=key,
+            fingerprint=fingerprint,
+            claimed_by=token,
+            locked_until=now + timedelta(seconds=self.lease_seconds),
+            expires_at=now + timedelta(seconds=self.ttl),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["method", "path", "key"],
+            set_={
+                "fingerprint": stmt.excluded.fingerprint,
+                "claimed_by": stmt.excluded.claimed_by,
+                "locked_until": stmt.excluded.locked_until,
+                "expires_at": stmt.excluded.expires_at,
+                "status": None,
+                "headers": None,
+                "body": None,
+            },
+            where=or_(
+                IdempotencyKey.expires_at < now,
+                and_(IdempotencyKey.status.is_(None), IdempotencyKey.locked_until < now),
+            ),
+        )
+        async with self.session() as session, session.begin():
+            claimed = (await session.execute(stmt.returning(IdempotencyKey.key))).first()
+            if claimed is not None:
+                self.claims += 1
+                return None
+            row = (
+                await session.execute(
+                    select(
+                        IdempotencyKey.fingerprint,
+                        IdempotencyKey.status,
+                        IdempotencyKey.headers,
+                        IdempotencyKey.body,
+                    ).where(self._key_condition(store_key))
+                )
+            ).first()
+        if row is None:
+            # Purged in between; the next claim gets it
+            return Holder(fingerprint, None)
+        response = None
+        if row.status is not None:
+            headers = [
+                (name.encode("latin-1"), value.encode("latin-1")) for name, value in row.headers
+            ]
+            response = StoredResponse(row.fingerprint, row.status, headers, row.body)
+        return Holder(row.fingerprint, response)
+
+    async def complete(self, store_key: tuple, token: str, response: StoredResponse) -> None:
+        self.responses.set(store_key, response)
+        headers = [
+            [name.decode("latin-1"), value.decode("latin-1")] for name, value in response.headers
+        ]
+        async with self.session() as session, session.begin():
+            await session.execute(
+                update(IdempotencyKey)
+                .where(self._key_condition(store_key), IdempotencyKey.claimed_by == token)
+                .values(
+                    status=response.status,
+                    headers=headers,
+                    body=response.body,
+                    locked_until=None,
+                )
+            )
+
+    async def release(self, store_key: tuple, token: str) -> None:
+        """
+        Gives up the claim of a request whose response is not stored, so a retry runs again.
+        """
+        async with self.session() as session, session.begin():
+            await session.execute(
+                delete(IdempotencyKey).where(
+                    self._key_condition(store_key),
+                    IdempotencyKey.claimed_by == token,
+                    IdempotencyKey.status.is_(None),
+                )
+            )
+
+    async def purge(self) -> int:
+        async with self.session() as session, session.begin():
+            result = await session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now())
+            )
+        return result.rowcount
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval_seconds)
+            try:
+                await self.purge()
+            except Exception as e:
+                logger.warning("Idempotency key purge failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.responses.stats(),
+            "in_flight": len(self.in_flight),
+            "claims": self.claims,
+            "replays": self.replays,
+            "waits": self.waits,
+            "mismatches": self.mismatches,
+        }
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware making POST and PATCH requests sent with an ``Idempotency-Key`` header
+    safe to retry.
+
+    The first attempt runs as usual and its response is stored if it succeeded or failed
+    with a client error a retry would get again, i.e. not a 5xx, a 408, 409, 425 or 429, nor
+    any response carrying a ``Retry-After`` header. Repeating the request with the same key,
+    on any worker, replays that response with an ``Idempotent-Replayed`` header, without
+    reaching the handler. A duplicate arriving while the first attempt runs waits for it.
+    Reusing a key for a different body or query string is answered with a 422.
+    """
+
+    def __init__(self, app, store: IdempotencyStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        key = None
+        if scope["type"] == "http" and scope["method"] in IDEMPOTENT_METHODS:
+            key = _header(scope, IDEMPOTENCY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse(
+                {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                status_code=400,
+            )
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.blake2b(scope["query_string"] + b"?" + body, digest_size=16).digest()
+        store_key = (scope["method"], scope["path"], key.decode("latin-1"))
+
+        while True:
+            stored = self.store.responses.get(store_key)
+            if stored is not None:
+                await self._replay(stored, fingerprint, scope, receive, send)
+                return
+            in_flight = self.store.in_flight.get(store_key)
+            if in_flight is None:
+                break
+            if in_flight[0] != fingerprint:
+                await self._mismatch(scope, receive, send)
+                return
+            self.store.waits += 1
+            # The first attempt may fail without a stored response, in which case this one
+            # runs instead
+            await asyncio.shield(in_flight[1])
+
+        done = asyncio.get_running_loop().create_future()
+        self.store.in_flight[store_key] = (fingerprint, done)
+        try:
+            token = await self._claim(store_key, fingerprint, scope, receive, send)
+            if token is not None:
+                await self._run(store_key, fingerprint, token, body, scope, receive, send)
+        finally:
+            del self.store.in_flight[store_key]
+            done.set_result(None)
+
+    async def _claim(
+        self, store_key: tuple, fingerprint: bytes, scope, receive, send
+    ) -> Optional[str]:
+        """
+        Claims the key for this request and returns the claim's token, or answers the request
+        from the one holding the key, once it completed, and returns None.
+        """
+        token = uuid4().hex
+        while True:
+            holder = await self.store.claim(store_key, fingerprint, token)
+            if holder is None:
+                return token
+            if holder.fingerprint != fingerprint:
+                await self._mismatch(scope, receive, send)
+                return None
+            if holder.response is not None:
+                self.store.responses.set(store_key, holder.response)
+                await self._replay(holder.response, fingerprint, scope, receive, send)
+                return None
+            # Running on another worker; its claim lapses if the worker goes away
+            self.store.waits += 1
+            await asyncio.sleep(self.store.poll_seconds)
+
+    async def _run(
+        self, store_key: tuple, fingerprint: bytes, token: str, body: bytes, scope, receive, send
+    ):
+        start, chunks = None, []
+        received = False
+
+        async def replay_receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored = None
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+            if start is not None:
+                headers = list(start.get("headers", []))
+                if _storable(start["status"], headers):
+                    stored = StoredResponse(
+                        fingerprint, start["status"], headers, b"".join(chunks)
+                    )
+        finally:
+            # The response has been sent already; a claim left behind lapses with its lease
+            try:
+                if stored is not None:
+                    await self.store.complete(store_key, token, stored)
+                else:
+                    await self.store.release(store_key, token)
+            except Exception as e:
+                logger.warning("Could not record the outcome of an idempotent request: %s", e)
+
+    async def _replay(self, stored: StoredResponse, fingerprint: bytes, scope, receive, send):
+        if stored.fingerprint != fingerprint:
+            await self._mismatch(scope, receive, send)
+            return
+        self.store.replays += 1
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [*stored.headers, (REPLAYED_HEADER, b"true")],
+            }
+        )
+        await send({"type": "http.response.body", "body": stored.body})
+
+    async def _mismatch(self, scope, receive, send):
+        self.store.mismatches += 1
+        response = JSONResponse(
+            {"detail": "Idempotency-Key was already used for a different request"},
+            status_code=422,
+        )
+        await response(scope, receive, send)
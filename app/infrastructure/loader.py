@@ -0,0 +1,96 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    In-process DataLoader: lookups issued within ``window_seconds`` of each other are merged
+    into one ``fetch`` call, and lookups of keys already being fetched wait for that fetch
+    instead of starting another one (single flight).
+
+    ``fetch`` receives the distinct keys of a batch and returns the values it found; missing
+    keys resolve to None.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        window_seconds: float = 0.002,
+        max_batch_size: int = 500,
+    ):
+        self.fetch = fetch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._in_flight: Dict[K, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.requested = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        return (await self.load_many([key])).get(key)
+
+    async def load_many(self, keys: Iterable[K]) -> Dict[K, V]:
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for key in dict.fromkeys(keys):
+            self.requested += 1
+            future = self._in_flight.get(key) or self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = self._pending[key] = loop.create_future()
+                if len(self._pending) >= self.max_batch_size:
+                    self._dispatch()
+                elif self._timer is None:
+                    self._timer = loop.call_later(self.window_seconds, self._dispatch)
+            futures[key] = future
+
+        # Shielded: a cancelled request must not cancel the lookup for the others waiting on it
+        values = await asyncio.gather(*(asyncio.shield(future) for future in futures.values()))
+        return {key: value for key, value in zip(futures, values, strict=True) if value is not None}
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._in_flight.update(batch)
+        self.batches += 1
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[K, asyncio.Future]) -> None:
+        try:
+            values = await self.fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Marks the exception as retrieved: the waiters, if any, re-raise it
+                    future.exception()
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(values.get(key))
+        finally:
+            for key, future in batch.items():
+                future.cancel()
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "requested": self.requested,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "in_flight": len(self._in_flight),
+        }
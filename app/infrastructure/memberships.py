@@ -0,0 +1,116 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import ARRAY, Integer, bindparam, delete, func, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure import capacity
+from app.infrastructure.models.site import Site, site_group_association
+from app.infrastructure.serialization import id_in
+
+Pair = Tuple[int, int]
+
+
+def _unnest(ids: Iterable[int], name: str):
+    return (
+        func.unnest(bindparam(None, sorted(set(ids)), type_=ARRAY(Integer)))
+        .table_valued(name)
+        .render_derived()
+    )
+
+
+async def load_sites(db: AsyncSession, site_ids: Iterable[int]) -> Dict[int, capacity.SiteFacts]:
+    """
+    Capacity facts of the given sites with their current groups, by id, with one query.
+    Unknown ids are left out.
+    """
+    group_ids = func.array(
+        select(site_group_association.c.group_id)
+        .where(site_group_association.c.site_id == Site.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            Site.id,
+            Site.country,
+            Site.installation_date,
+            Site.max_power_megawatt,
+            Site.min_power_megawatt,
+            group_ids,
+        ).where(id_in(Site.id, site_ids))
+    )
+    return {
+        site_id: capacity.SiteFacts(country, installed, high or 0.0, low or 0.0, tuple(groups))
+        for site_id, country, installed, high, low, groups in result
+    }
+
+
+async def insert_pairs(
+    db: AsyncSession, site_ids: Iterable[int], group_ids: Iterable[int]
+) -> List[Pair]:
+    """
+    Adds every site of ``site_ids`` to every group of ``group_ids`` with one
+    ``INSERT ... SELECT`` over the two id arrays, skipping the memberships that already exist.
+    Returns the ``(site_id, group_id)`` pairs actually added.
+    """
+    sites, groups = _unnest(site_ids, "site_id"), _unnest(group_ids, "group_id")
+    pairs = select(sites.c.site_id, groups.c.group_id).select_from(sites.join(groups, true()))
+    stmt = (
+        insert(site_group_association)
+        .from_select(["site_id", "group_id"], pairs)
+        .on_conflict_do_nothing()
+        .returning(site_group_association.c.site_id, site_group_association.c.group_id)
+    )
+    return [tuple(row) for row in await db.execute(stmt)]
+
+
+async def delete_pairs(
+    db: AsyncSession, site_ids: Iterable[int], group_ids: Iterable[int]
+) -> List[Pair]:
+    """
+    Takes every site of ``site_ids`` out of every group of ``group_ids`` with one statement.
+    Returns the ``(site_id, group_id)`` pairs actually removed.
+    """
+    stmt = (
+        delete(site_group_association)
+        .where(
+            id_in(site_group_association.c.site_id, site_ids),
+            id_in(site_group_association.c.group_id, group_ids),
+        )
+        .returning(site_group_association.c.site_id, site_group_association.c.group_id)
+    )
+    return [tuple(row) for row in await db.execute(stmt)]
+
+
+async def change_memberships(
+    db: AsyncSession,
+    before: Dict[int, capacity.SiteFacts],
+    add: Sequence[int] = (),
+    remove: Sequence[int] = (),
+) -> Tuple[List[Pair], List[Pair], Dict[int, capacity.SiteFacts]]:
+    """
+    Adds the sites of ``before`` (as returned by ``load_sites``) to the groups of ``add`` and
+    takes them out of the groups of ``remove``, with at most one INSERT and one DELETE
+    whatever the number of sites, then applies the difference to the capacity summaries.
+
+    Returns the pairs added, the pairs removed and the new facts of the sites whose
+    memberships changed, by id. A group in both lists is left alone.
+    """
+    remove = set(remove) - set(add)
+    removed = await delete_pairs(db, before, remove) if before and remove else []
+    added = await insert_pairs(db, before, add) if before and add else []
+
+    groups = {site_id: set(before[site_id].group_ids) for site_id, _ in (*removed, *added)}
+    for site_id, group_id in removed:
+        groups[site_id].discard(group_id)
+    for site_id, group_id in added:
+        groups[site_id].add(group_id)
+    after = {
+        site_id: before[site_id]._replace(group_ids=tuple(sorted(group_ids)))
+        for site_id, group_ids in groups.items()
+    }
+    await capacity.apply_site_changes(
+        db, removed=[before[site_id] for site_id in after], added=list(after.values())
+    )
+    return added, removed, after
@@ -0,0 +1,246 @@
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Slow request logging keeps at most this many statements per request
+MAX_RECORDED_QUERIES = 100
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition format.
+    """
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        # counts has one more entry than buckets, the +Inf one, added after the loop
+        for bound, count in zip(self.buckets, self.counts[:-1], strict=True):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "endpoint_seconds", "serialize_seconds", "queries")
+
+    def __init__(self, record_queries: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.endpoint_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.queries: Optional[List[Tuple[str, float]]] = [] if record_queries else None
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class MetricsRegistry:
+    """
+    Per-route request, database and serialization metrics for the whole process.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.db_statements: Dict[Tuple[str, str], Histogram] = {}
+        self.serialize_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+        if key not in self.latency:
+            self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.db_seconds[key] = Histogram(LATENCY_BUCKETS)
+            self.db_statements[key] = Histogram(COUNT_BUCKETS)
+            self.serialize_seconds[key] = Histogram(LATENCY_BUCKETS)
+        self.latency[key].observe(seconds)
+        self.db_seconds[key].observe(stats.db_seconds)
+        self.db_statements[key].observe(stats.statements)
+        self.serialize_seconds[key].observe(stats.serialize_seconds)
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """
+        Registers a callable returning extra exposition lines (e.g. pool or cache gauges).
+        """
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = ["# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(self.requests.items()):
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            lines.append(f"http_requests_total{{{labels}}} {count}")
+        for name, histograms in (
+            ("http_request_duration_seconds", self.latency),
+            ("http_request_db_seconds", self.db_seconds),
+            ("http_request_db_statements", self.db_statements),
+            ("http_response_serialization_seconds", self.serialize_seconds),
+        ):
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), histogram in sorted(histograms.items()):
+                lines.extend(histogram.render(name, f'method="{method}",route="{route}"'))
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def gauges(prefix: str, values: Dict[str, float]) -> List[str]:
+    return [
+        f"# TYPE {prefix}_{name} gauge\n{prefix}_{name} {value}" for name, value in values.items()
+    ]
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and attributing its SQL work to the route.
+
+    ``slow_request_seconds`` enables logging of the statements run by requests slower than
+    that threshold.
+    """
+
+    def __init__(self, app, slow_request_seconds: Optional[float] = None):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(record_queries=self.slow_request_seconds is not None)
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "<unmatched>"
+            registry.record(scope["method"], route_path, status, elapsed, stats)
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                logger.warning(
+                    "Slow request %s %s took %.3fs with %d statements (%.3fs in DB): %s",
+                    scope["method"],
+                    route_path,
+                    elapsed,
+                    stats.statements,
+                    stats.db_seconds,
+                    stats.queries,
+                )
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route that separates the endpoint's own run time from the rest of the route handler.
+
+    The rest of the handler's time (request parsing, dependency setup and, above all,
+    ``response_model`` validation and JSON encoding) is recorded as serialization time.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            start = time.perf_counter()
+            response = await handler(request)
+            stats = _request_stats.get()
+            if stats is not None:
+                elapsed = time.perf_counter() - start
+                stats.serialize_seconds = max(elapsed - stats.endpoint_seconds, 0.0)
+            return response
+
+        return timed_handler
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                stats = _request_stats.get()
+                if stats is not None:
+                    stats.endpoint_seconds = time.perf_counter() - start
+
+        return wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.endpoint_seconds = time.perf_counter() - start
+
+    return sync_wrapper
+
+
+def install_query_hooks(engine: AsyncEngine) -> None:
+    """
+    Counts the statements and DB time of each request through cursor execute events.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if _request_stats.get() is not None:
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _request_stats.get()
+        started = conn.info.get("query_start_time")
+        if stats is None or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        if stats.queries is not None and len(stats.queries) < MAX_RECORDED_QUERIES:
+            stats.queries.append((statement, elapsed))
@@ -46,3 +46,8 @@ Base = declarative_base()
 # Ensure to import all your models here so that they are registered with the Base metadata
 from .group import Group  # Import the Group model
 from .site import Site  # Import the Site model
+from .quota import QuotaReservation  # Import the QuotaReservation model
+from .capacity import CapacitySummary  # Import the CapacitySummary model
+from .change import Change  # Import the Change model
+from .measurement import SiteMeasurement  # Import the SiteMeasurement model
+from .idempotency import IdempotencyKey  # Import the IdempotencyKey model
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.infrastructure.models.db import Base
+
+
+class CapacitySummary(Base):
+    """
+    Site count and installed power for one value of a dimension: a country, an installation
+    month ("YYYY-MM") or a group id, in which case descendant groups are rolled up.
+    """
+    __tablename__ = 'capacity_summary'
+
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    site_count = Column(Integer, nullable=False, default=0)
+    max_power_megawatt = Column(Float, nullable=False, default=0.0)
+    min_power_megawatt = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,31 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, func, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.infrastructure.models.db import Base
+
+
+class Change(Base):
+    """
+    One create, update or delete of a site or group, in commit order.
+
+    ``country`` and ``group_ids`` are what change feed subscribers filter on: the site's
+    country and the groups it belonged to before and after the change, or the group itself.
+
+    Writers only take an ``id``; the feed numbers the changes in ``seq`` once they have
+    committed, so that the sequence follows the commit order.
+    """
+    __tablename__ = 'changes'
+    __table_args__ = (
+        # Committed changes still waiting for their sequence number
+        Index("ix_changes_pending", "id", postgresql_where=text("seq IS NULL")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    seq = Column(BigInteger, nullable=True, unique=True, index=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    country = Column(String, nullable=True)
+    group_ids = Column(ARRAY(Integer), nullable=False, server_default='{}')
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
@@ -1,16 +1,145 @@
-from collections.abc import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import logging
+import random
+import time
+from uuid import uuid4
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from app.config import get_settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import Settings, get_settings
+from app.infrastructure.replicas import Replica, ReplicaSet, sticky_until
 from sqlalchemy.orm import sessionmaker
 
 Base = declarative_base()
 
-DB_URL = "postgresql+asyncpg://user:password@db:5432/dbname"
+sql_logger = logging.getLogger("app.sql")
+
+
+class PoolStats:
+    """
+    Counters describing how requests compete for pooled connections.
+    """
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float) -> None:
+        self.acquisitions += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records acquire wait time, overflow connections and checkout timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def _inc_overflow(self):
+        # The overflow counter starts at -pool_size, so only positive values are connections
+        # opened beyond the pool
+        incremented = super()._inc_overflow()
+        if incremented and self._overflow > 0:
+            self.stats.overflow_events += 1
+        return incremented
 
-engine = create_async_engine(DB_URL, echo=True)
+    def snapshot(self) -> dict:
+        stats = self.stats
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "acquisitions": stats.acquisitions,
+            "wait_seconds_total": stats.wait_seconds_total,
+            "wait_seconds_max": stats.wait_seconds_max,
+            "overflow_events": stats.overflow_events,
+            "timeouts": stats.timeouts,
+        }
+
+
+def _install_sampled_echo(engine: AsyncEngine, sample_rate: float) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def log_statement(conn, cursor, statement, parameters, context, executemany):
+        if sample_rate >= 1.0 or random.random() < sample_rate:
+            sql_logger.info("%s %r", statement, parameters)
+
+
+def build_engine(url: str, settings: Settings) -> AsyncEngine:
+    """
+    Creates an async engine whose pool, statement caches and SQL logging follow ``settings``.
+    """
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args["statement_cache_size"] = settings.db_statement_cache_size
+        connect_args["prepared_statement_cache_size"] = settings.db_prepared_statement_cache_size
+        if settings.db_pgbouncer_compat:
+            # pgbouncer may hand each transaction a different server connection, so
+            # prepared statement names must never be reused
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+    if settings.db_echo:
+        _install_sampled_echo(engine, settings.db_echo_sample_rate)
+    return engine
+
+
+settings = get_settings()
+engine = build_engine(settings.db_url, settings)
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+replicas = ReplicaSet(
+    async_session,
+    [
+        Replica(f"replica{index}", build_engine(url, settings))
+        for index, url in enumerate(settings.db_replica_urls)
+    ],
+    settings.db_replica_max_lag_seconds,
+    settings.db_replica_check_interval,
+)
+
 async def get_db() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Session for read-only handlers: a healthy replica, unless the client wrote recently.
+    """
+    if sticky_until(request.headers.get("cookie")) > time.time():
+        session = async_session()
+        session.info["sticky"] = True
+    else:
+        session = replicas.session()
+    async with session:
+        yield session
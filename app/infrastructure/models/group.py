@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from app.infrastructure.models.db import Base
 import enum
@@ -10,11 +10,30 @@ class GroupType(enum.Enum):
 
 class Group(Base):
     __tablename__ = 'groups'
+    __table_args__ = (
+        Index("ix_groups_type_id", "type", "id"),
+        Index("ix_groups_parent_id", "parent_id"),
+        # Fuzzy name search (pg_trgm)
+        Index(
+            "ix_groups_name_trgm",
+            "name",
+            postgresql_using="gist",
+            postgresql_ops={"name": "gist_trgm_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String, index=True, unique=True)
     type = Column(String)
-    parent_id = Column(Integer, ForeignKey('groups.id'))
+    # Deleting a group deletes its subtree; the API applies the chosen child policy first
+    parent_id = Column(Integer, ForeignKey('groups.id', ondelete='CASCADE'))
     parent = relationship("Group", remote_side=[id], back_populates="children")
-    children = relationship("Group", back_populates="parent")
-    sites = relationship("Site", secondary="site_group_association", back_populates="groups")
+    children = relationship("Group", back_populates="parent", passive_deletes=True)
+    sites = relationship(
+        "Site", secondary="site_group_association", back_populates="groups", passive_deletes=True
+    )
+
+
+# Case-insensitive name prefix search; the "C" collation serves both the LIKE range and the
+# ORDER BY, so a prefix query reads only the rows it returns
+Index("ix_groups_name_lower", func.lower(Group.name).collate("C"))
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import JSONB
+from app.infrastructure.models.db import Base
+
+
+class IdempotencyKey(Base):
+    """
+    The response to a POST or PATCH request sent with an ``Idempotency-Key`` header, shared
+    by every worker.
+
+    While ``status`` is null the request is still running on the worker holding the claim,
+    until ``locked_until``; a claim that lapses can be taken over by a retry.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    method = Column(String, primary_key=True)
+    path = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(LargeBinary, nullable=False)
+    claimed_by = Column(String, nullable=False)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    status = Column(Integer, nullable=True)
+    headers = Column(JSONB, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+from app.infrastructure.models.db import Base
+
+
+class SiteMeasurement(Base):
+    """
+    One reading of a site, at 1-minute resolution.
+
+    The table is partitioned by day on ``measured_at``; partitions are created ahead of time
+    and dropped once past the retention period by ``app.infrastructure.telemetry``.
+    """
+    __tablename__ = 'site_measurements'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (measured_at)'}
+
+    site_id = Column(Integer, ForeignKey('sites.id', ondelete='CASCADE'), primary_key=True)
+    measured_at = Column(DateTime(timezone=True), primary_key=True)
+    power_megawatt = Column(Float, nullable=False)
+    energy_megawatt_hour = Column(Float, nullable=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from app.infrastructure.models.db import Base
+
+
+class QuotaReservation(Base):
+    """
+    One consumed slot of a capacity rule (e.g. "one French site per day").
+
+    The primary key makes each (rule, period, slot) claimable by a single site, so concurrent
+    writers cannot both take the last slot, and the cascade frees it with the site.
+    """
+    __tablename__ = 'quota_reservations'
+
+    rule = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    site_id = Column(
+        Integer, ForeignKey('sites.id', ondelete='CASCADE'), nullable=False, index=True
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Table, Enum
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Table, Index, func
 from sqlalchemy.orm import relationship
 from app.infrastructure.models.db import Base
 
@@ -6,14 +6,29 @@ from app.infrastructure.models.db import Base
 site_group_association = Table(
     "site_group_association",
     Base.metadata,
-    Column("site_id", Integer, ForeignKey("sites.id"), primary_key=True),
-    Column("group_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("site_id", Integer, ForeignKey("sites.id", ondelete="CASCADE"), primary_key=True),
+    Column("group_id", Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_site_group_association_group_id_site_id", "group_id", "site_id"),
 )
 
 
 
 class Site(Base):
     __tablename__ = 'sites'
+    __table_args__ = (
+        # Keyset pagination indexes: every sortable column is paired with the id tie-breaker
+        Index("ix_sites_installation_date_id", "installation_date", "id"),
+        Index("ix_sites_country_installation_date_id", "country", "installation_date", "id"),
+        Index("ix_sites_max_power_megawatt_id", "max_power_megawatt", "id"),
+        Index("ix_sites_min_power_megawatt_id", "min_power_megawatt", "id"),
+        # Fuzzy name search (pg_trgm)
+        Index(
+            "ix_sites_name_trgm",
+            "name",
+            postgresql_using="gist",
+            postgresql_ops={"name": "gist_trgm_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -23,5 +38,11 @@ class Site(Base):
     useful_energy_at_1_megawatt = Column(Float)
     efficiency = Column(Float)
     country = Column(String)
-    groups = relationship("Group", secondary="site_group_association", back_populates="sites")
+    groups = relationship(
+        "Group", secondary="site_group_association", back_populates="sites", passive_deletes=True
+    )
 
+
+# Case-insensitive name prefix search; the "C" collation serves both the LIKE range and the
+# ORDER BY, so a prefix query reads only the rows it returns
+Index("ix_sites_name_lower", func.lower(Site.name).collate("C"))
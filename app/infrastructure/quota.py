@@ -0,0 +1,114 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure.models.quota import QuotaReservation
+
+
+class QuotaRule(NamedTuple):
+    """
+    At most ``capacity`` sites per ``period`` ("day" or "week", weeks starting on Monday).
+    """
+    name: str
+    capacity: int
+    period: str = "day"
+
+    def period_start(self, day: date) -> date:
+        if self.period == "week":
+            return day - timedelta(days=day.weekday())
+        return day
+
+
+FR_DAILY_INSTALLATIONS = QuotaRule("fr_daily_installations", capacity=1)
+
+# deadlock_detected and serialization_failure: the statement can simply be run again
+RETRYABLE_SQLSTATES = frozenset({"40P01", "40001"})
+CONTENTION_RETRIES = 3
+
+
+class QuotaContentionError(RuntimeError):
+    """
+    The reservation kept colliding with concurrent writers; the request can be retried.
+    """
+
+
+async def _insert_reservations(db: AsyncSession, rows: List[dict]) -> Set[int]:
+    # Slots are locked in one global order, so two writers claiming overlapping periods
+    # wait for each other instead of deadlocking
+    rows = sorted(rows, key=lambda row: (row["period_start"], row["slot"]))
+    stmt = insert(QuotaReservation).on_conflict_do_nothing().returning(QuotaReservation.site_id)
+    for _ in range(CONTENTION_RETRIES):
+        try:
+            # A savepoint, so a failed attempt leaves the rest of the transaction usable
+            async with db.begin_nested():
+                result = await db.execute(stmt, rows)
+                return set(result.scalars().all())
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) not in RETRYABLE_SQLSTATES:
+                raise
+    raise QuotaContentionError("Quota reservations conflicted with concurrent writes, retry later")
+
+
+async def reserve(
+    db: AsyncSession, rule: QuotaRule, claims: Iterable[Tuple[int, date]]
+) -> Set[int]:
+    """
+    Claims a slot of ``rule`` for each ``(site_id, installation_date)`` and returns the site ids
+    that got one.
+
+    Slots are taken with ``INSERT ... ON CONFLICT DO NOTHING`` on the reservation primary key,
+    so the check never scans ``sites`` and two transactions can never hold the same slot. A
+    writer that loses a race for a slot retries on the slots still free.
+    """
+    pending: Dict[int, date] = {site_id: rule.period_start(day) for site_id, day in claims}
+    granted: Set[int] = set()
+
+    for _ in range(rule.capacity):
+        if not pending:
+            break
+
+        used = defaultdict(set)
+        if rule.capacity > 1:
+            result = await db.execute(
+                select(QuotaReservation.period_start, QuotaReservation.slot).where(
+                    QuotaReservation.rule == rule.name,
+                    QuotaReservation.period_start.in_(set(pending.values())),
+                )
+            )
+            for period_start, slot in result:
+                used[period_start].add(slot)
+
+        rows = []
+        for site_id, period_start in pending.items():
+            free = [slot for slot in range(rule.capacity) if slot not in used[period_start]]
+            if free:
+                used[period_start].add(free[0])
+                rows.append(
+                    {
+                        "rule": rule.name,
+                        "period_start": period_start,
+                        "slot": free[0],
+                        "site_id": site_id,
+                    }
+                )
+        if not rows:
+            break
+
+        won = await _insert_reservations(db, rows)
+        granted |= won
+        pending = {row["site_id"]: row["period_start"] for row in rows if row["site_id"] not in won}
+
+    return granted
+
+
+async def release(db: AsyncSession, site_ids: Iterable[int]) -> None:
+    """
+    Frees every slot held by the given sites, e.g. before re-reserving after a date change.
+    """
+    await db.execute(delete(QuotaReservation).where(QuotaReservation.site_id.in_(list(site_ids))))
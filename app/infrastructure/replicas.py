@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import logging
+import time
+from http.cookies import CookieError, SimpleCookie
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Cookie holding the time until which the client's reads stay on the primary
+STICKY_COOKIE = "primary_until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Seconds the replica is behind; 0 on a primary or a replica that replayed all it received
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+
+
+class ReplicaSet:
+    """
+    Routes read-only sessions to healthy replicas, round-robin, and to the primary when
+    none is healthy.
+
+    ``check`` marks a replica unhealthy when it cannot be reached within ``check_timeout``
+    seconds or lags more than ``max_lag_seconds`` behind the primary; ``run`` repeats it
+    every ``check_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        primary_session: sessionmaker,
+        replicas: List[Replica],
+        max_lag_seconds: float,
+        check_interval: float,
+        check_timeout: float = 2.0,
+    ):
+        self.primary_session = primary_session
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._next = itertools.cycle(replicas)
+        self._last_write = float("-inf")
+
+    def session(self) -> AsyncSession:
+        for _ in range(len(self.replicas)):
+            replica = next(self._next)
+            if replica.healthy:
+                session = replica.session()
+                session.info["replica"] = replica.name
+                return session
+        return self.primary_session()
+
+    def note_write(self) -> None:
+        self._last_write = time.monotonic()
+
+    def written_recently(self) -> bool:
+        """
+        Whether this worker wrote so recently that the replicas may not have replayed it.
+        """
+        return time.monotonic() - self._last_write < self.max_lag_seconds
+
+    def may_be_stale(self, session: Optional[AsyncSession] = None) -> bool:
+        """
+        Whether reads from ``session``, or from any session ``session()`` may hand out, can
+        miss this worker's latest writes; such reads must not fill shared caches.
+        """
+        if session is not None:
+            on_replica = "replica" in session.info
+        else:
+            on_replica = any(replica.healthy for replica in self.replicas)
+        return on_replica and self.written_recently()
+
+    async def _lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as conn:
+            return float((await conn.execute(LAG_QUERY)).scalar())
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                replica.lag_seconds = await asyncio.wait_for(
+                    self._lag(replica), self.check_timeout
+                )
+            except Exception as e:
+                if replica.healthy:
+                    logger.warning("Replica %s is unreachable: %s", replica.name, e)
+                replica.healthy, replica.lag_seconds = False, None
+                continue
+            healthy = replica.lag_seconds <= self.max_lag_seconds
+            if healthy != replica.healthy:
+                logger.warning(
+                    "Replica %s is %s (lag %.1fs)",
+                    replica.name,
+                    "back in rotation" if healthy else "lagging, reads fall back to the primary",
+                    replica.lag_seconds,
+                )
+            replica.healthy = healthy
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    def snapshot(self) -> dict:
+        return {
+            replica.name: {"healthy": replica.healthy, "lag_seconds": replica.lag_seconds}
+            for replica in self.replicas
+        }
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def sticky_until(cookie_header: Optional[str]) -> float:
+    if not cookie_header:
+        return 0.0
+    try:
+        morsel = SimpleCookie(cookie_header).get(STICKY_COOKIE)
+        return float(morsel.value) if morsel is not None else 0.0
+    except (CookieError, ValueError):
+        return 0.0
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that keeps a client's reads on the primary for ``window_seconds`` after
+    each successful write, through a cookie, so the client sees its own changes even while
+    the replicas catch up.
+    """
+
+    def __init__(self, app, replicas: ReplicaSet, window_seconds: float):
+        self.app = app
+        self.replicas = replicas
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        # Noted before the handler runs as well, so no replica read racing the commit can
+        # fill a cache with the old state
+        self.replicas.note_write()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                self.replicas.note_write()
+                until = time.time() + self.window_seconds
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.window_seconds) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())],
+                }
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,74 @@
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import Float, Select, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site
+from app.infrastructure.serialization import id_in
+from app.schemas import SearchMatch
+
+# Trigram matching needs at least this many characters to say anything useful; shorter
+# queries only match name prefixes
+FUZZY_MIN_LENGTH = 3
+
+SITE_SEARCH_COLUMNS = (Site.id, Site.name, Site.country)
+GROUP_SEARCH_COLUMNS = (Group.id, Group.name, Group.type)
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _score(name_column, q: str):
+    return func.word_similarity(q, name_column).label("score")
+
+
+def prefix_query(columns: Sequence, name_column, q: str, limit: int) -> Select:
+    """
+    Names starting with ``q``, case-insensitively, in byte order: a range scan of the
+    ``lower(name) COLLATE "C"`` index that stops after ``limit`` rows.
+    """
+    lowered = func.lower(name_column).collate("C")
+    return (
+        select(*columns, _score(name_column, q))
+        # Backslash is LIKE's default escape character
+        .where(lowered.like(escape_like(q.lower()) + "%"))
+        .order_by(lowered)
+        .limit(limit)
+    )
+
+
+def fuzzy_query(
+    columns: Sequence, name_column, id_column, q: str, exclude_ids: List[int], limit: int
+) -> Select:
+    """
+    Names containing a word similar to ``q``, nearest first: a nearest-neighbour scan of the
+    trigram GiST index, so the cost depends on ``limit`` rather than on the number of matches.
+    """
+    return (
+        select(*columns, _score(name_column, q))
+        .where(literal(q).op("<%")(name_column), ~id_in(id_column, exclude_ids))
+        .order_by(literal(q).op("<<->", return_type=Float)(name_column), id_column)
+        .limit(limit)
+    )
+
+
+async def search_names(
+    db: AsyncSession, columns: Sequence, name_column, id_column, q: str, limit: int
+) -> List[Tuple[Any, SearchMatch]]:
+    """
+    Ranked typeahead matches for ``q``: prefix matches first, then fuzzy ones to fill up to
+    ``limit`` results.
+    """
+    q = q.strip()
+    rows = (await db.execute(prefix_query(columns, name_column, q, limit))).all()
+    hits = [(row, SearchMatch.PREFIX) for row in rows]
+    if len(hits) < limit and len(q) >= FUZZY_MIN_LENGTH:
+        found = [row.id for row in rows]
+        result = await db.execute(
+            fuzzy_query(columns, name_column, id_column, q, found, limit - len(hits))
+        )
+        hits.extend((row, SearchMatch.FUZZY) for row in result)
+    return hits
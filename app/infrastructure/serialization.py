@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence
+
+import orjson
+from fastapi.responses import Response
+from sqlalchemy import ARRAY, Integer, Select, any_, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site, site_group_association
+
+# Plain column selects for the read endpoints, in the field order of SiteSchema / GroupSchema.
+# Rows are turned into dicts and encoded by orjson, skipping the ORM identity map and the
+# response model validation.
+SITE_COLUMNS = (
+    Site.id,
+    Site.name,
+    Site.installation_date,
+    Site.max_power_megawatt,
+    Site.min_power_megawatt,
+    Site.useful_energy_at_1_megawatt,
+    Site.efficiency,
+    Site.country,
+)
+GROUP_COLUMNS = (Group.id, Group.name, Group.type, Group.parent_id)
+
+
+def id_in(column, ids: Iterable[int]):
+    """
+    ``column = ANY(:ids)`` with the ids bound as one array, so every batch size shares one
+    prepared statement where ``IN`` would render one placeholder per id.
+    """
+    return column == any_(bindparam(None, list(ids), type_=ARRAY(Integer)))
+
+
+def group_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    id, name, type, parent_id = row
+    return {"id": id, "name": name, "type": type, "parent_id": parent_id}
+
+
+def site_groups_query(site_ids: Iterable[int]) -> Select:
+    return (
+        select(site_group_association.c.site_id, *GROUP_COLUMNS)
+        .join(Group, Group.id == site_group_association.c.group_id)
+        .where(id_in(site_group_association.c.site_id, site_ids))
+        .order_by(site_group_association.c.site_id, Group.id)
+    )
+
+
+async def site_dicts(db: AsyncSession, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Builds the SiteSchema payload of ``SITE_COLUMNS`` rows, loading all their groups with
+    one extra query.
+    """
+    sites = [
+        {
+            "id": id,
+            "name": name,
+            "installation_date": installation_date,
+            "max_power_megawatt": max_power_megawatt,
+            "min_power_megawatt": min_power_megawatt,
+            "useful_energy_at_1_megawatt": useful_energy_at_1_megawatt,
+            "efficiency": efficiency,
+            "country": country,
+            "groups": [],
+        }
+        for (
+            id,
+            name,
+            installation_date,
+            max_power_megawatt,
+            min_power_megawatt,
+            useful_energy_at_1_megawatt,
+            efficiency,
+            country,
+        ) in rows
+    ]
+    if not sites:
+        return sites
+
+    groups = defaultdict(list)
+    result = await db.execute(site_groups_query([site["id"] for site in sites]))
+    for site_id, *group in result:
+        groups[site_id].append(group_dict(group))
+    for site in sites:
+        site["groups"] = groups[site["id"]]
+    return sites
+
+
+async def fetch_sites(db: AsyncSession, site_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    SiteSchema payloads of the given sites, by id, with one query plus one for their groups.
+    """
+    result = await db.execute(select(*SITE_COLUMNS).where(id_in(Site.id, site_ids)))
+    return {site["id"]: site for site in await site_dicts(db, result.all())}
+
+
+async def fetch_groups(db: AsyncSession, group_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    GroupSchema payloads of the given groups, by id, with one query.
+    """
+    result = await db.execute(select(*GROUP_COLUMNS).where(id_in(Group.id, group_ids)))
+    return {row.id: group_dict(row) for row in result}
+
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload)
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """
+    Returns an already encoded JSON response; FastAPI passes it through untouched.
+    """
+    return Response(dumps(payload), status_code=status_code, media_type="application/json")
@@ -0,0 +1,560 @@
+import asyncio
+import logging
+import sys
+import time
+from contextlib import aclosing
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.changes import ChangeFeed, ChangeFilter
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site, site_group_association
+from app.infrastructure.serialization import GROUP_COLUMNS, SITE_COLUMNS, group_dict, id_in
+from app.schemas import ChangeEntity, CountryEnum
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES = [country.value for country in CountryEnum]
+COUNTRY_CODES = {country: code for code, country in enumerate(COUNTRIES)}
+UNKNOWN_COUNTRY = 255
+# Columns with a sorted index; sorting by name is left to Postgres, whose collation decides
+# the order
+INDEXED_COLUMNS = ("installation_date", "max_power_megawatt", "min_power_megawatt")
+FLOAT_COLUMNS = (
+    "max_power_megawatt",
+    "min_power_megawatt",
+    "useful_energy_at_1_megawatt",
+    "efficiency",
+)
+# Dates are stored as proleptic ordinals, 0 standing for NULL
+NO_DATE = 0
+# Range filters matching more than 1/SCAN_RATIO of the sites compare the column instead of
+# going through its index
+SCAN_RATIO = 16
+# The sites and their memberships are read from one snapshot of the database
+CONSISTENT_READ = {"isolation_level": "REPEATABLE READ"}
+# Rows of a sort index checked against the filters at a time when paging
+PAGE_CHUNK = 4096
+
+
+class SiteFilter(NamedTuple):
+    """
+    The ``list_sites`` filters; ``group_ids`` matches the sites in any of the groups.
+    """
+    country: Optional[str] = None
+    installed_from: Optional[date] = None
+    installed_to: Optional[date] = None
+    max_power_from: Optional[float] = None
+    max_power_to: Optional[float] = None
+    group_ids: Optional[Sequence[int]] = None
+
+
+class SortedIndex(NamedTuple):
+    """
+    Row positions ordered by ``(value, position)``, with the values alongside for
+    ``searchsorted``. NaN values sort last.
+    """
+    values: np.ndarray
+    positions: np.ndarray
+
+    @classmethod
+    def build(cls, values: np.ndarray, positions: Optional[np.ndarray] = None) -> "SortedIndex":
+        if positions is None:
+            positions = np.arange(len(values), dtype=np.int64)
+        order = np.lexsort((positions, values))
+        return cls(values[order], positions[order])
+
+    def bounds(self, low, high) -> Tuple[int, int]:
+        """
+        The slice of the index holding the values within ``[low, high]``.
+        """
+        return (
+            np.searchsorted(self.values, low, "left"),
+            np.searchsorted(self.values, high, "right"),
+        )
+
+    def range(self, low, high) -> np.ndarray:
+        """
+        Positions of the rows whose value lies within ``[low, high]``.
+        """
+        start, end = self.bounds(low, high)
+        return self.positions[start:end]
+
+    def merge(
+        self,
+        keep: np.ndarray,
+        old_to_new: np.ndarray,
+        values: np.ndarray,
+        positions: np.ndarray,
+    ) -> "SortedIndex":
+        """
+        The index once the rows not in ``keep`` are gone, the others renumbered through
+        ``old_to_new`` and the given rows added: linear copies plus one binary search per
+        added row, instead of sorting everything again.
+        """
+        kept = keep[self.positions]
+        old_values, old_positions = self.values[kept], old_to_new[self.positions[kept]]
+        order = np.lexsort((positions, values))
+        values, positions = values[order], positions[order]
+        points = np.searchsorted(old_values, values, "left")
+        ends = np.searchsorted(old_values, values, "right")
+        # Equal values stay ordered by position
+        for i in np.flatnonzero(ends > points):
+            points[i] += np.searchsorted(old_positions[points[i]:ends[i]], positions[i])
+        return SortedIndex(
+            np.insert(old_values, points, values), np.insert(old_positions, points, positions)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.positions.nbytes
+
+
+def _site_arrays(rows: Sequence[Sequence]) -> Dict[str, np.ndarray]:
+    """
+    Column arrays of ``SITE_COLUMNS`` rows sorted by id; NULL numbers become NaN.
+    """
+    count = len(rows)
+    keys = [column.key for column in SITE_COLUMNS]
+    if rows:
+        columns = dict(zip(keys, zip(*rows, strict=True), strict=True))
+    else:
+        columns = {key: () for key in keys}
+    arrays = {
+        "id": np.fromiter(columns["id"], dtype=np.int64, count=count),
+        "name": np.array(list(columns["name"]), dtype=object),
+        "installation_date": np.fromiter(
+            (day.toordinal() if day else NO_DATE for day in columns["installation_date"]),
+            dtype=np.int32,
+            count=count,
+        ),
+        "country": np.fromiter(
+            (COUNTRY_CODES.get(country, UNKNOWN_COUNTRY) for country in columns["country"]),
+            dtype=np.uint8,
+            count=count,
+        ),
+    }
+    for column in FLOAT_COLUMNS:
+        arrays[column] = np.array(list(columns[column]), dtype=float)
+    # Strings are the only objects held outside the arrays
+    arrays["name_bytes"] = np.fromiter(
+        (sys.getsizeof(name) for name in arrays["name"]), dtype=np.int64, count=count
+    )
+    return arrays
+
+
+def _group_lists(
+    ids: np.ndarray, pairs: Sequence[Tuple[int, int]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The group ids of each site as CSR arrays: the groups of the site at position ``i`` are
+    ``groups[offsets[i]:offsets[i + 1]]``. ``pairs`` are ordered by site then group id.
+    """
+    sites = np.fromiter((site_id for site_id, _ in pairs), dtype=np.int64, count=len(pairs))
+    groups = np.fromiter((group_id for _, group_id in pairs), dtype=np.int64, count=len(pairs))
+    lengths = np.bincount(np.searchsorted(ids, sites), minlength=len(ids))
+    return np.concatenate(([0], np.cumsum(lengths))).astype(np.int64), groups
+
+
+class FleetColumns:
+    """
+    An immutable columnar copy of the sites, ordered by id: one array per column, the group
+    ids of each site, a bitmap per country and sorted indexes on the dates, the powers and
+    the group memberships. Changes produce a new copy through ``merge``.
+    """
+
+    def __init__(
+        self,
+        arrays: Dict[str, np.ndarray],
+        group_offsets: np.ndarray,
+        group_ids: np.ndarray,
+        indexes: Dict[str, SortedIndex],
+        members: SortedIndex,
+    ):
+        self.arrays = arrays
+        self.ids = arrays["id"]
+        self.group_offsets = group_offsets
+        self.group_ids = group_ids
+        self.indexes = indexes
+        self.members = members
+        self.countries = {code: arrays["country"] == code for code in range(len(COUNTRIES))}
+
+    @classmethod
+    def build(cls, rows: Sequence[Sequence], pairs: Sequence[Tuple[int, int]]) -> "FleetColumns":
+        arrays = _site_arrays(rows)
+        offsets, group_ids = _group_lists(arrays["id"], pairs)
+        return cls(
+            arrays,
+            offsets,
+            group_ids,
+            {column: SortedIndex.build(arrays[column]) for column in INDEXED_COLUMNS},
+            SortedIndex.build(group_ids, _member_positions(offsets)),
+        )
+
+    def merge(
+        self, site_ids: Iterable[int], rows: Sequence[Sequence], pairs: Sequence[Tuple[int, int]]
+    ) -> "FleetColumns":
+        """
+        A copy where the sites of ``site_ids`` are replaced by ``rows`` and their groups by
+        ``pairs``; the ids without a row were deleted. Costs a few linear copies of the
+        arrays, whatever the number of sites changed.
+        """
+        changed = np.fromiter(sorted(set(site_ids)), dtype=np.int64)
+        keep = ~np.isin(self.ids, changed, assume_unique=True)
+        added = _site_arrays(rows)
+        kept_ids = self.ids[keep]
+        points = np.searchsorted(kept_ids, added["id"])
+        kept_count, added_count = len(kept_ids), len(added["id"])
+
+        old_to_new = np.full(len(self.ids), -1, dtype=np.int64)
+        old_to_new[keep] = np.arange(kept_count) + np.searchsorted(
+            points, np.arange(kept_count), "right"
+        )
+        added_positions = points + np.arange(added_count)
+        arrays = {
+            column: np.insert(values[keep], points, added[column])
+            for column, values in self.arrays.items()
+        }
+
+        added_offsets, added_groups = _group_lists(added["id"], pairs)
+        lengths = np.diff(self.group_offsets)
+        kept_offsets = np.concatenate(([0], np.cumsum(lengths[keep])))
+        group_ids = np.insert(
+            self.group_ids[np.repeat(keep, lengths)],
+            np.repeat(kept_offsets[points], np.diff(added_offsets)),
+            added_groups,
+        )
+        lengths = np.insert(lengths[keep], points, np.diff(added_offsets))
+        group_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        indexes = {
+            column: index.merge(keep, old_to_new, added[column], added_positions)
+            for column, index in self.indexes.items()
+        }
+        members = self.members.merge(
+            keep,
+            old_to_new,
+            added_groups,
+            np.repeat(added_positions, np.diff(added_offsets)),
+        )
+        return FleetColumns(arrays, group_offsets, group_ids, indexes, members)
+
+    def member_ids(self, group_ids: Iterable[int]) -> List[int]:
+        """
+        Ids of the sites in any of the groups.
+        """
+        positions = [self.members.range(group_id, group_id) for group_id in group_ids]
+        return self.ids[np.concatenate(positions)].tolist() if positions else []
+
+    def mask(self, filters: SiteFilter) -> np.ndarray:
+        """
+        Whether each site matches ``filters``; NULL values never match a bound.
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if filters.country is not None:
+            code = COUNTRY_CODES.get(filters.country)
+            mask &= self.countries[code] if code is not None else False
+        if filters.installed_from is not None or filters.installed_to is not None:
+            low, high = filters.installed_from, filters.installed_to
+            low = low.toordinal() if low is not None else NO_DATE + 1
+            high = high.toordinal() if high is not None else date.max.toordinal()
+            mask &= self._between("installation_date", low, high)
+        if filters.max_power_from is not None or filters.max_power_to is not None:
+            low = -np.inf if filters.max_power_from is None else filters.max_power_from
+            high = np.inf if filters.max_power_to is None else filters.max_power_to
+            mask &= self._between("max_power_megawatt", low, high)
+        if filters.group_ids:
+            mask &= self._within(
+                np.concatenate(
+                    [self.members.range(group_id, group_id) for group_id in filters.group_ids]
+                )
+            )
+        return mask
+
+    def _between(self, column: str, low, high) -> np.ndarray:
+        index = self.indexes[column]
+        start, end = index.bounds(low, high)
+        # Scattering the positions of a wide range costs more than comparing the whole column
+        if (end - start) * SCAN_RATIO > len(self.ids):
+            values = self.arrays[column]
+            return (values >= low) & (values <= high)
+        return self._within(index.positions[start:end])
+
+    def _within(self, positions: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def page(
+        self,
+        filters: SiteFilter,
+        sort: str,
+        descending: bool,
+        after: Optional[Tuple[object, int]],
+        limit: int,
+    ) -> np.ndarray:
+        """
+        Positions of the page of matching sites following ``after`` in ``(sort, id)`` order,
+        plus one more when there is a next page, like ``keyset_page``.
+
+        The sort index is walked from the cursor one chunk at a time until the page is full,
+        so the cost depends on how many rows the filters skip rather than on the fleet size.
+        """
+        mask = self.mask(filters)
+        if sort == "id":
+            values, positions = self.ids, np.arange(len(self.ids))
+        else:
+            index = self.indexes[sort]
+            values, positions = index.values, index.positions
+
+        # Rows with an equal value are ordered by position, which is the id order
+        if after is None:
+            cut = len(positions) if descending else 0
+        else:
+            value, row_id = after
+            if isinstance(value, date):
+                value = value.toordinal()
+            start, end = SortedIndex(values, positions).bounds(value, value)
+            ids = self.ids[positions[start:end]]
+            cut = start + np.searchsorted(ids, row_id, "left" if descending else "right")
+
+        if descending:
+            chunks = ((max(stop - PAGE_CHUNK, 0), stop) for stop in range(cut, 0, -PAGE_CHUNK))
+        else:
+            stops = range(cut, len(positions), PAGE_CHUNK)
+            chunks = ((begin, begin + PAGE_CHUNK) for begin in stops)
+        picked, found = [], 0
+        for begin, stop in chunks:
+            chunk = positions[begin:stop]
+            chunk = chunk[mask[chunk]]
+            picked.append(chunk[::-1] if descending else chunk)
+            found += len(chunk)
+            if found > limit:
+                break
+        if not picked:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(picked)[:limit + 1]
+
+    def site_dicts(self, positions: np.ndarray, groups: Dict[int, dict]) -> List[dict]:
+        """
+        SiteSchema payloads of the given rows, with the keys in ``site_dicts``' order.
+        """
+        arrays = self.arrays
+        columns = [
+            self.ids[positions].tolist(),
+            arrays["name"][positions].tolist(),
+            [
+                date.fromordinal(day) if day != NO_DATE else None
+                for day in arrays["installation_date"][positions].tolist()
+            ],
+        ]
+        for column in FLOAT_COLUMNS:
+            values = arrays[column][positions]
+            columns.append(np.where(np.isnan(values), None, values).tolist())
+        columns.append(
+            [
+                COUNTRIES[code] if code != UNKNOWN_COUNTRY else None
+                for code in arrays["country"][positions].tolist()
+            ]
+        )
+        starts = self.group_offsets[positions].tolist()
+        ends = self.group_offsets[positions + 1].tolist()
+        members = (
+            self.group_ids[start:end].tolist() for start, end in zip(starts, ends, strict=True)
+        )
+        columns.append(
+            [[groups[group_id] for group_id in ids if group_id in groups] for ids in members]
+        )
+        keys = [*(column.key for column in SITE_COLUMNS), "groups"]
+        return [dict(zip(keys, row, strict=True)) for row in zip(*columns, strict=True)]
+
+    def memory(self) -> Dict[str, int]:
+        """
+        Bytes held, by part; names count their string objects too.
+        """
+        memory = {
+            f"column_{column}": values.nbytes
+            for column, values in self.arrays.items()
+            if column != "name_bytes"
+        }
+        memory["column_name"] += int(self.arrays["name_bytes"].sum())
+        memory["group_lists"] = self.group_offsets.nbytes + self.group_ids.nbytes
+        memory["country_bitmaps"] = sum(bitmap.nbytes for bitmap in self.countries.values())
+        for column, index in self.indexes.items():
+            memory[f"index_{column}"] = index.nbytes
+        memory["index_groups"] = self.members.nbytes
+        return memory
+
+
+def _member_positions(offsets: np.ndarray) -> np.ndarray:
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+
+class FleetSnapshot:
+    """
+    An in-memory, columnar copy of the sites, groups and memberships that answers the site
+    filter and count queries without going to the database.
+
+    Write handlers ``touch`` the ids they changed once committed, and changes committed by
+    other workers arrive through the change feed. Touched rows are reloaded from the primary
+    before the next query is answered, with one query per table whatever their number, and
+    merged into a new copy; ``rebuild`` reloads everything.
+    """
+
+    def __init__(self, session: sessionmaker, rebuild_seconds: float = 3600.0):
+        self.session = session
+        self.rebuild_seconds = rebuild_seconds
+        self.columns: Optional[FleetColumns] = None
+        self.groups: Dict[int, dict] = {}
+        self.built_at = float("-inf")
+        self._dirty_sites: Set[int] = set()
+        self._dirty_groups: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self.rebuilds = 0
+        self.refreshes = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.columns is not None
+
+    def touch(self, site_ids: Iterable[int] = (), group_ids: Iterable[int] = ()) -> None:
+        self._dirty_sites.update(site_ids)
+        self._dirty_groups.update(group_ids)
+
+    async def _read(self, conn: AsyncConnection, site_ids: Optional[Iterable[int]] = None):
+        # Plain Core rows: the ORM result machinery would double the time of a full load
+        sites = select(*SITE_COLUMNS).order_by(Site.id)
+        pairs = select(site_group_association.c.site_id, site_group_association.c.group_id)
+        pairs = pairs.order_by(site_group_association.c.site_id, site_group_association.c.group_id)
+        if site_ids is not None:
+            site_ids = list(site_ids)
+            sites = sites.where(id_in(Site.id, site_ids))
+            pairs = pairs.where(id_in(site_group_association.c.site_id, site_ids))
+        return (await conn.execute(sites)).all(), (await conn.execute(pairs)).all()
+
+    async def rebuild(self) -> None:
+        """
+        Reloads every site, group and membership from one consistent view of the database.
+        """
+        async with self._lock:
+            self._dirty_sites, self._dirty_groups = set(), set()
+            started = time.monotonic()
+            async with self.session() as session, session.begin():
+                conn = await session.connection(execution_options=CONSISTENT_READ)
+                rows, pairs = await self._read(conn)
+                groups = (await conn.execute(select(*GROUP_COLUMNS))).all()
+            self.columns = FleetColumns.build(rows, pairs)
+            self.groups = {row.id: group_dict(row) for row in groups}
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+            logger.info(
+                "Built the fleet snapshot of %d sites in %.3fs",
+                len(self.columns.ids),
+                self.built_at - started,
+            )
+
+    async def refresh(self) -> None:
+        """
+        Reloads the touched sites and groups, if any.
+        """
+        if not (self._dirty_sites or self._dirty_groups):
+            return
+        async with self._lock:
+            site_ids, group_ids = self._dirty_sites, self._dirty_groups
+            self._dirty_sites, self._dirty_groups = set(), set()
+            if not (site_ids or group_ids):
+                return
+            try:
+                async with self.session() as session, session.begin():
+                    conn = await session.connection(execution_options=CONSISTENT_READ)
+                    result = await conn.execute(
+                        select(*GROUP_COLUMNS).where(id_in(Group.id, group_ids))
+                    )
+                    groups = {row.id: group_dict(row) for row in result}
+                    # Deleting a group removes its memberships without touching the sites
+                    site_ids |= set(self.columns.member_ids(group_ids - groups.keys()))
+                    rows, pairs = await self._read(conn, site_ids) if site_ids else ([], [])
+            except Exception:
+                self.touch(site_ids, group_ids)
+                raise
+            if site_ids:
+                self.columns = self.columns.merge(site_ids, rows, pairs)
+            for group_id in group_ids:
+                if group_id in groups:
+                    self.groups[group_id] = groups[group_id]
+                else:
+                    self.groups.pop(group_id, None)
+            self.refreshes += 1
+
+    async def count(self, filters: SiteFilter) -> int:
+        await self.refresh()
+        return int(np.count_nonzero(self.columns.mask(filters)))
+
+    async def page(
+        self,
+        filters: SiteFilter,
+        sort: str,
+        descending: bool,
+        after: Optional[Tuple[object, int]],
+        limit: int,
+    ) -> List[dict]:
+        """
+        The SiteSchema payloads of the page following ``after``, plus one more when there is
+        a next page.
+        """
+        await self.refresh()
+        columns = self.columns
+        positions = columns.page(filters, sort, descending, after, limit)
+        return columns.site_dicts(positions, self.groups)
+
+    async def follow(self, feed: ChangeFeed) -> None:
+        """
+        Builds the snapshot, then keeps it in line with the change feed, rebuilding it when
+        changes were missed and every ``rebuild_seconds``.
+        """
+        while True:
+            try:
+                after = feed.last_seq
+                await self.rebuild()
+                stream = feed.stream(ChangeFilter(), after=after)
+                async with aclosing(stream) as changes:
+                    async for change in changes:
+                        if change is not None and change["op"] == "reset":
+                            break
+                        if change is not None and change["entity"] == ChangeEntity.SITE.value:
+                            self.touch(site_ids=[change["id"]])
+                        elif change is not None:
+                            self.touch(group_ids=[change["id"]])
+                        if self.expired():
+                            break
+                # Ends when this subscriber fell behind, or for the periodic rebuild
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Fleet snapshot update failed, rebuilding: %s", e)
+                await asyncio.sleep(1.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.rebuild_seconds
+
+    def stats(self) -> Dict[str, float]:
+        stats = {
+            "ready": int(self.ready),
+            "sites": len(self.columns.ids) if self.ready else 0,
+            "groups": len(self.groups),
+            "pending": len(self._dirty_sites) + len(self._dirty_groups),
+            "age_seconds": time.monotonic() - self.built_at if self.ready else 0.0,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+        }
+        if self.ready:
+            memory = self.columns.memory()
+            stats["memberships"] = len(self.columns.group_ids)
+            stats["bytes"] = sum(memory.values())
+            stats.update((f"bytes_{part}", size) for part, size in memory.items())
+        return stats
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import List, Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Executable
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future import select
+
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site
+from app.infrastructure.pagination import keyset_page
+from app.infrastructure.search import GROUP_SEARCH_COLUMNS, SITE_SEARCH_COLUMNS, prefix_query
+from app.infrastructure.serialization import GROUP_COLUMNS, SITE_COLUMNS, id_in, site_groups_query
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+class SchemaOutOfDateError(RuntimeError):
+    pass
+
+
+class Readiness:
+    """
+    Whether this worker should receive traffic: set once the startup work is done and
+    cleared again on shutdown.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.reason = "starting"
+
+    def mark_ready(self) -> None:
+        self.ready, self.reason = True, None
+
+    def mark_not_ready(self, reason: str) -> None:
+        self.ready, self.reason = False, reason
+
+
+def head_revision() -> Optional[str]:
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+async def check_schema(engine: AsyncEngine) -> None:
+    """
+    Makes sure the database has been migrated to the latest Alembic revision, instead of
+    creating the tables. Raises ``SchemaOutOfDateError`` otherwise.
+    """
+    async with engine.connect() as conn:
+        current = await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision()
+        )
+    expected = head_revision()
+    if current != expected:
+        raise SchemaOutOfDateError(
+            f"Database schema is at revision {current}, expected {expected}; "
+            "run `alembic upgrade head` first"
+        )
+    logger.info("Database schema is at revision %s", current)
+
+
+def hot_statements() -> List[Executable]:
+    """
+    The statements of the busiest read endpoints, built exactly as the handlers build them so
+    the prepared statements they leave behind are the ones requests reuse.
+    """
+    return [
+        select(*SITE_COLUMNS).where(id_in(Site.id, [0])),
+        site_groups_query([0]),
+        select(*GROUP_COLUMNS).where(id_in(Group.id, [0])),
+        keyset_page(select(*SITE_COLUMNS), Site.id, Site.id, False, None, 0),
+        keyset_page(select(*GROUP_COLUMNS), Group.id, Group.id, False, None, 0),
+        prefix_query(SITE_SEARCH_COLUMNS, Site.name, "", 0),
+        prefix_query(GROUP_SEARCH_COLUMNS, Group.name, "", 0),
+    ]
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """
+    Opens up to ``connections`` pooled connections at once and prepares the hot statements on
+    each of them, so the first requests skip connection setup and statement preparation.
+
+    Returns the number of connections warmed; never more than the pool size, since overflow
+    connections are closed as soon as they are released.
+    """
+    connections = min(connections, engine.pool.size())
+    if connections <= 0:
+        return 0
+
+    statements = hot_statements()
+
+    async def warm(stack: AsyncExitStack):
+        # Every connection stays checked out until all are open, so none is reused
+        conn = await stack.enter_async_context(engine.connect())
+        for statement in statements:
+            await conn.execute(statement)
+
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(*(warm(stack) for _ in range(connections)))
+    logger.info("Warmed %d pooled connections", connections)
+    return connections
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, Table, func, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.infrastructure.bulk import copy_rows
+from app.infrastructure.models.measurement import SiteMeasurement
+from app.schemas import MeasurementBucket
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = SiteMeasurement.__tablename__
+PARTITION_PREFIX = f"{PARENT_TABLE}_p"
+# Transaction-level advisory lock serializing partition DDL across workers
+PARTITION_LOCK_KEY = 0x74656C656D
+MEASUREMENT_COLUMNS = ("site_id", "measured_at", "power_megawatt", "energy_megawatt_hour")
+BUCKET_ORIGIN = datetime(1970, 1, 1, tzinfo=timezone.utc)
+BUCKET_SIZES = {
+    MeasurementBucket.MINUTE: timedelta(minutes=1),
+    MeasurementBucket.FIVE_MINUTES: timedelta(minutes=5),
+    MeasurementBucket.FIFTEEN_MINUTES: timedelta(minutes=15),
+    MeasurementBucket.HOUR: timedelta(hours=1),
+    MeasurementBucket.DAY: timedelta(days=1),
+}
+
+# Per-connection temporary table the readings are copied into before being merged; kept
+# out of Base.metadata so create_all does not create it
+staging = Table(
+    f"{PARENT_TABLE}_staging",
+    MetaData(),
+    Column("site_id", Integer),
+    Column("measured_at", DateTime(timezone=True)),
+    Column("power_megawatt", Float),
+    Column("energy_megawatt_hour", Float),
+)
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def day_bound(day: date) -> str:
+    return datetime.combine(day, time(), timezone.utc).isoformat()
+
+
+class MeasurementPartitions:
+    """
+    Keeps one ``site_measurements`` partition per UTC day, from the retention cutoff to
+    ``days_ahead`` days ahead.
+
+    Partitions are created and dropped in their own short transactions, since both take an
+    exclusive lock on the parent table; old data goes with a ``DROP TABLE`` rather than row
+    deletes.
+    """
+
+    def __init__(
+        self,
+        session: sessionmaker,
+        retention_days: int,
+        days_ahead: int,
+        interval_seconds: float,
+        lock_timeout_seconds: float = 5.0,
+    ):
+        self.session = session
+        self.retention_days = retention_days
+        self.days_ahead = days_ahead
+        self.interval_seconds = interval_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self._known: Set[date] = set()
+
+    def window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        """
+        First and last day readings are accepted for.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        first = today - timedelta(days=self.retention_days - 1)
+        return first, today + timedelta(days=self.days_ahead)
+
+    async def _existing(self, db: AsyncSession) -> Set[date]:
+        result = await db.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = :parent
+                """
+            ),
+            {"parent": PARENT_TABLE},
+        )
+        return {
+            datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+            for name in result.scalars()
+            if name.startswith(PARTITION_PREFIX)
+        }
+
+    async def _lock(self, db: AsyncSession) -> None:
+        await db.execute(select(func.pg_advisory_xact_lock(PARTITION_LOCK_KEY)))
+        # Waiting behind a long query on the parent would stall every reader queued after us
+        await db.execute(text(f"SET LOCAL lock_timeout = '{int(self.lock_timeout_seconds)}s'"))
+
+    async def ensure(self, days: Iterable[date]) -> None:
+        """
+        Creates the missing partitions for ``days``; a no-op for days already known.
+        """
+        missing = set(days) - self._known
+        if not missing:
+            return
+        async with self.session() as session, session.begin():
+            await self._lock(session)
+            existing = await self._existing(session)
+            for day in sorted(missing - existing):
+                await session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} "
+                        f"PARTITION OF {PARENT_TABLE} "
+                        f"FOR VALUES FROM ('{day_bound(day)}') "
+                        f"TO ('{day_bound(day + timedelta(days=1))}')"
+                    )
+                )
+                logger.info("Created partition %s", partition_name(day))
+        self._known |= missing | existing
+
+    async def maintain(self, today: Optional[date] = None) -> List[str]:
+        """
+        Creates the partitions of the retention window and drops the ones past it. Returns
+        the names of the dropped partitions.
+        """
+        first, last = self.window(today)
+        await self.ensure(first + timedelta(days=n) for n in range((last - first).days + 1))
+
+        async with self.session() as session:
+            expired = sorted(day for day in await self._existing(session) if day < first)
+        dropped = []
+        for day in expired:
+            try:
+                async with self.session() as session, session.begin():
+                    await self._lock(session)
+                    await session.execute(text(f"DROP TABLE IF EXISTS {partition_name(day)}"))
+            except Exception as e:
+                logger.warning("Could not drop partition %s, retrying later: %s", day, e)
+                continue
+            self._known.discard(day)
+            dropped.append(partition_name(day))
+            logger.info("Dropped partition %s", partition_name(day))
+        return dropped
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.warning("Partition maintenance failed: %s", e)
+
+
+async def ingest(db: AsyncSession, readings: Sequence[tuple]) -> int:
+    """
+    Writes ``(site_id, measured_at, power, energy)`` readings within the session's
+    transaction: they are streamed with COPY into a temporary staging table, then merged with
+    one ``INSERT ... ON CONFLICT``, so a repeated reading overwrites the stored one and a
+    retried batch is harmless. Returns the number of rows written.
+    """
+    # The merge may not touch a row twice; the last reading of a site and minute wins
+    readings = list({(reading[0], reading[1]): reading for reading in readings}.values())
+    if not readings:
+        return 0
+    # Lives as long as the pooled connection, so only the first batch on it creates it
+    await db.execute(
+        text(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging.name} (LIKE {PARENT_TABLE})")
+    )
+    await copy_rows(db, staging, MEASUREMENT_COLUMNS, readings)
+    columns = ", ".join(MEASUREMENT_COLUMNS)
+    result = await db.execute(
+        text(
+            f"INSERT INTO {PARENT_TABLE} ({columns}) SELECT {columns} FROM {staging.name} "
+            "ON CONFLICT (site_id, measured_at) DO UPDATE SET "
+            "power_megawatt = excluded.power_megawatt, "
+            "energy_megawatt_hour = excluded.energy_megawatt_hour"
+        )
+    )
+    await db.execute(text(f"DELETE FROM {staging.name}"))
+    return result.rowcount
+
+
+async def series(
+    db: AsyncSession, site_id: int, start: datetime, end: datetime, bucket: timedelta
+) -> List[Dict]:
+    """
+    Downsampled readings of one site over ``[start, end)``, aggregated in the database per
+    ``bucket`` aligned on UTC midnight; empty buckets are left out.
+    """
+    bucket_start = func.date_bin(bucket, SiteMeasurement.measured_at, literal(BUCKET_ORIGIN))
+    result = await db.execute(
+        select(
+            bucket_start.label("bucket_start"),
+            func.count().label("samples"),
+            func.avg(SiteMeasurement.power_megawatt).label("power_avg"),
+            func.min(SiteMeasurement.power_megawatt).label("power_min"),
+            func.max(SiteMeasurement.power_megawatt).label("power_max"),
+            func.sum(SiteMeasurement.energy_megawatt_hour).label("energy_megawatt_hour"),
+        )
+        .where(
+            SiteMeasurement.site_id == site_id,
+            SiteMeasurement.measured_at >= start,
+            SiteMeasurement.measured_at < end,
+        )
+        # By output column: the bucket expression holds bound parameters, so repeating it would
+        # not count as the same expression
+        .group_by(text("bucket_start"))
+        .order_by(text("bucket_start"))
+    )
+    return [dict(row._mapping) for row in result]
+
+
+async def _maintain_command() -> None:
+    from app.config import get_settings
+    from app.infrastructure.models.db import async_session, engine
+
+    settings = get_settings()
+    partitions = MeasurementPartitions(
+        async_session,
+        settings.telemetry_retention_days,
+        settings.telemetry_days_ahead,
+        settings.telemetry_maintenance_interval_seconds,
+    )
+    dropped = await partitions.maintain()
+    logger.info("Partitions are up to date, dropped %d", len(dropped))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    # python -m app.infrastructure.telemetry
+    asyncio.run(_maintain_command())
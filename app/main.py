@@ -1,64 +1,392 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Request
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from sqlalchemy import Integer, and_, cast, func, literal, text
+from sqlalchemy import delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload
-from sqlalchemy.exc import IntegrityError
-
-from app.infrastructure import models
-from app.infrastructure.models.db import get_db, Base, engine
-from app.infrastructure.models.group import Group, GroupType
-from app.infrastructure.models.site import Site
-from app.schemas import Site as SiteSchema, SiteCreate, Group as GroupSchema, GroupCreate
-from typing import List
-from datetime import date, timedelta
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.config import get_settings
+from app.infrastructure.admission import AdmissionLimit, AdmissionMiddleware
+from app.infrastructure.bulk import copy_rows, upsert_rows
+from app.infrastructure import capacity, changes, memberships, telemetry
+from app.infrastructure.changes import ChangeFeed, ChangeFilter
+from app.infrastructure.deletes import GroupHasChildrenError, delete_groups, delete_sites
+from app.infrastructure.cache import CachedBody, TTLCache, etag_matches, make_etag
+from app.infrastructure.energy import CurveExecutor, site_columns
+from app.infrastructure.loader import BatchLoader
+from app.infrastructure.hierarchy import ancestors_cte, descendants_cte, descendant_pairs_cte
+from app.infrastructure.hierarchy import HierarchyCycleError, ancestor_pairs_cte, parents_first
+from app.infrastructure.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.infrastructure.metrics import (
+    InstrumentedRoute,
+    MetricsMiddleware,
+    gauges,
+    install_query_hooks,
+    registry,
+)
+from app.infrastructure.quota import QuotaContentionError, release
+from app.infrastructure.replicas import SAFE_METHODS, ReadYourWritesMiddleware
+from app.infrastructure.telemetry import BUCKET_SIZES, MeasurementPartitions, as_utc
+from app.infrastructure.search import GROUP_SEARCH_COLUMNS, SITE_SEARCH_COLUMNS, search_names
+from app.infrastructure.snapshot import FleetSnapshot, SiteFilter
+from app.infrastructure.serialization import GROUP_COLUMNS, SITE_COLUMNS
+from app.infrastructure.startup import Readiness, check_schema, warm_pool
+from app.infrastructure.serialization import dumps, group_dict, json_response, site_dicts
+from app.infrastructure.serialization import fetch_groups, fetch_sites, id_in
+from app.infrastructure.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.infrastructure.pagination import keyset_page
+from app.infrastructure.models.capacity import CapacitySummary
+from app.infrastructure.models.db import get_db, get_read_db, Base, async_session, engine, replicas
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site, site_group_association
+from app.rules import site_rules
+from app.schemas import SiteSchema, SiteCreate, GroupSchema, GroupCreate, GroupNode
+from app.schemas import GroupUpdate, MembershipResult, SiteCount, SiteUpdate
+from app.schemas import SiteBulkItemResult, SiteBulkResult, SitePage, GroupPage
+from app.schemas import CountryEnum, GroupType
+from app.schemas import SortOrder, SiteSortField, GroupSortField, ExportFormat
+from app.schemas import ChangeEntity, ChangeOp, ChildPolicy, DeleteResult
+from app.schemas import GroupSearchHit, SiteSearchHit
+from app.schemas import MeasurementBucket, MeasurementBulkItemError, MeasurementBulkResult
+from app.schemas import MeasurementCreate, MeasurementPoint
+from app.schemas import CapacityDimension, CapacityRow, EnergyCurve, EnergyCurveScope
+from app.schemas import ConflictAction, GroupConflictKey, GroupBulkChunkResult, GroupBulkResult
+from typing import List, Optional
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+import asyncio
+from contextlib import aclosing
+import csv
+import io
+import json
 import logging
-import os
+import numpy as np
 from dotenv import load_dotenv
+from pydantic import ValidationError
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
+settings = get_settings()
+
+# Probes, metrics and long-lived change streams hold no database connection while they run
+ADMISSION_EXEMPT_PREFIXES = ("/health/", "/changes/", "/metrics", "/docs", "/redoc", "/openapi")
+BULK_ROUTES = {
+    ("POST", "/sites/bulk"),
+    ("POST", "/groups/bulk_create"),
+    ("POST", "/measurements/bulk"),
+    ("DELETE", "/sites/"),
+    ("DELETE", "/groups/"),
+}
+
+
+def _admission_class(method: str, path: str) -> Optional[str]:
+    """
+    The admission limit a request waits in: bulk writes, exports and the other reads and
+    writes each have their own, so a burst of one class cannot starve the others.
+    """
+    if path.startswith(ADMISSION_EXEMPT_PREFIXES) or path.endswith("/stats"):
+        return None
+    if path == "/sites/export":
+        return "export"
+    # Membership lists of a group take up to MAX_MEMBERSHIP_IDS sites
+    group_sites = path.startswith("/groups/") and path.endswith("/sites")
+    if (method, path) in BULK_ROUTES or (group_sites and method in ("POST", "DELETE")):
+        return "bulk"
+    return "read" if method in SAFE_METHODS else "write"
+
+
+admission_limits = {
+    name: AdmissionLimit(
+        name,
+        getattr(settings, f"admission_{name}_concurrency"),
+        getattr(settings, f"admission_{name}_queue"),
+        settings.admission_queue_timeout_seconds,
+    )
+    for name in ("read", "write", "bulk", "export")
+}
+
 app = FastAPI()
+app.router.route_class = InstrumentedRoute
+if settings.admission_enabled:
+    # Added first so it runs inside the metrics middleware, which then sees the time spent
+    # queuing and the 503s
+    app.add_middleware(AdmissionMiddleware, limits=admission_limits, classify=_admission_class)
+# Outside the admission limits, so replays and duplicates waiting for the first attempt take
+# no slot, and a 503 from them is not stored
+idempotency_store = IdempotencyStore(
+    async_session,
+    settings.idempotency_max_entries,
+    settings.idempotency_ttl_seconds,
+    lease_seconds=settings.idempotency_lease_seconds,
+    poll_seconds=settings.idempotency_poll_seconds,
+)
+app.add_middleware(IdempotencyMiddleware, store=idempotency_store)
+app.add_middleware(MetricsMiddleware, slow_request_seconds=settings.metrics_slow_request_seconds)
+app.add_middleware(
+    ReadYourWritesMiddleware,
+    replicas=replicas,
+    window_seconds=settings.db_read_your_writes_seconds,
+)
+install_query_hooks(engine)
+for replica in replicas.replicas:
+    install_query_hooks(replica.engine)
+
+# Serialized single-record reads, keyed by ("site", id) / ("group", id). Cached sites are also
+# tagged with ("group", id) for each embedded group so group writes can drop them.
+read_cache = TTLCache(settings.cache_max_entries, settings.cache_ttl_seconds)
+readiness = Readiness()
+READINESS_TIMEOUT_SECONDS = 2.0
+curve_executor = CurveExecutor(settings.energy_curve_offload_cells, settings.energy_curve_workers)
+measurement_partitions = MeasurementPartitions(
+    async_session,
+    settings.telemetry_retention_days,
+    settings.telemetry_days_ahead,
+    settings.telemetry_maintenance_interval_seconds,
+)
+change_feed = ChangeFeed(
+    engine,
+    async_session,
+    poll_seconds=settings.change_feed_poll_seconds,
+    heartbeat_seconds=settings.change_feed_heartbeat_seconds,
+    retention_seconds=settings.change_feed_retention_hours * 3600,
+    max_queued=settings.change_feed_max_queued,
+)
+# Answers the site list and count queries from memory when enabled
+fleet_snapshot = (
+    FleetSnapshot(async_session, settings.fleet_snapshot_rebuild_seconds)
+    if settings.fleet_snapshot_enabled
+    else None
+)
+
+
+async def _load_sites(site_ids: List[int]) -> dict:
+    async with replicas.session() as session, session.begin():
+        return await fetch_sites(session, site_ids)
+
+
+async def _load_groups(group_ids: List[int]) -> dict:
+    async with replicas.session() as session, session.begin():
+        return await fetch_groups(session, group_ids)
+
+
+# Concurrent lookups of the same ids, from single and batch reads alike, share one query
+site_loader = BatchLoader(
+    _load_sites, settings.loader_window_seconds, settings.loader_max_batch_size
+)
+group_loader = BatchLoader(
+    _load_groups, settings.loader_window_seconds, settings.loader_max_batch_size
+)
+
+registry.add_collector(lambda: gauges("db_pool", engine.pool.snapshot()))
+registry.add_collector(lambda: gauges("read_cache", read_cache.stats()))
+registry.add_collector(lambda: gauges("site_loader", site_loader.stats()))
+registry.add_collector(lambda: gauges("group_loader", group_loader.stats()))
+registry.add_collector(lambda: gauges("change_feed", change_feed.stats()))
+registry.add_collector(lambda: gauges("idempotency", idempotency_store.stats()))
+for limit in admission_limits.values():
+    registry.add_collector(lambda limit=limit: gauges(f"admission_{limit.name}", limit.stats()))
+if fleet_snapshot is not None:
+    registry.add_collector(lambda: gauges("fleet_snapshot", fleet_snapshot.stats()))
+
+
+def _replica_gauges() -> List[str]:
+    nan = float("nan")
+    return [
+        line
+        for name, state in replicas.snapshot().items()
+        for line in gauges(
+            f"db_{name}",
+            {
+                "healthy": int(state["healthy"]),
+                "lag_seconds": nan if state["lag_seconds"] is None else state["lag_seconds"],
+            },
+        )
+    ]
+
+
+registry.add_collector(_replica_gauges)
+
+
+async def _load_many(loader: BatchLoader, fetch, db: AsyncSession, ids: List[int]) -> dict:
+    """
+    Reads through the shared loader, except for clients that just wrote: they must see their
+    own changes, so they read with their own primary session.
+    """
+    if db.info.get("sticky"):
+        async with db.begin():
+            return await fetch(db, ids)
+    return await loader.load_many(ids)
+
+
+MAX_BATCH_IDS = 500
+
+
+async def _read_batch(loader: BatchLoader, fetch, db: AsyncSession, ids: List[int]) -> list:
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    found = await _load_many(loader, fetch, db, ids)
+    return [found[item_id] for item_id in ids if item_id in found]
+
+
+def _touch_snapshot(site_ids=(), group_ids=()) -> None:
+    # Committed writes reach this worker's snapshot before its next query
+    if fleet_snapshot is not None:
+        fleet_snapshot.touch(site_ids, group_ids)
+
+
+async def _invalidate_read_cache() -> None:
+    """
+    Drops the entries made stale by the writes of every worker, as they reach the change feed,
+    and the whole cache whenever changes may have been missed.
+    """
+    while True:
+        read_cache.clear()
+        try:
+            stream = change_feed.stream(ChangeFilter())
+            async with aclosing(stream) as feed:
+                async for change in feed:
+                    if change is None:
+                        continue
+                    if change["entity"] == ChangeEntity.SITE.value:
+                        read_cache.invalidate(("site", change["id"]))
+                    else:
+                        read_cache.invalidate(("group", change["id"]))
+                        read_cache.invalidate_tag(("group", change["id"]))
+            # Ends when this subscriber fell behind
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Read cache invalidation failed, clearing: %s", e)
+            await asyncio.sleep(1.0)
+
+
+def _snapshot_serves(db: AsyncSession) -> bool:
+    # Clients that just wrote may have done so through another worker, whose changes reach
+    # this snapshot a moment later; they read from the primary instead
+    return fleet_snapshot is not None and fleet_snapshot.ready and not db.info.get("sticky")
+
+
+def _cacheable(db: AsyncSession) -> bool:
+    # Loader reads may come from any replica, the sticky ones come from the primary
+    return not replicas.may_be_stale(db if db.info.get("sticky") else None)
+
+
+def _cached(db: AsyncSession, key: tuple) -> Optional[CachedBody]:
+    # A sticky session has just written, and an entry may predate the write if it was cached
+    # from a lagging replica or by a worker that has not seen the invalidation yet
+    if db.info.get("sticky"):
+        return None
+    return read_cache.get(key)
+
+
+def _cached_response(request: Request, cached: CachedBody) -> Response:
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers={"ETag": cached.etag})
+    return Response(cached.body, media_type="application/json", headers={"ETag": cached.etag})
+
+
+def _integrity_error(e: IntegrityError) -> HTTPException:
+    # A concurrent write got in first; a retry may go through, so the answer carries a
+    # Retry-After, which also keeps it out of the idempotency store
+    return HTTPException(status_code=400, detail=str(e), headers={"Retry-After": "1"})
+
+
+@app.exception_handler(QuotaContentionError)
+async def quota_contention_handler(request: Request, exc: QuotaContentionError):
+    # The transaction is rolled back with the session; the whole request can be retried
+    return JSONResponse(status_code=409, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
-# Create the database tables on app startup
 @app.on_event("startup")
 async def startup():
-    logging.info("Creating tables...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if settings.startup_schema == "check":
+        await check_schema(engine)
+    else:
+        # Create the database tables on app startup
+        logging.info("Creating tables...")
+        async with engine.begin() as conn:
+            # The name search indexes use trigram operator classes
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.run_sync(Base.metadata.create_all)
+
+    # Replicas that are down or lagging are left out until a later check finds them healthy
+    await replicas.check()
+    warm_connections = settings.db_pool_warm_connections
+    engines = [engine, *(replica.engine for replica in replicas.replicas if replica.healthy)]
+    for db_engine in engines:
+        await warm_pool(
+            db_engine, db_engine.pool.size() if warm_connections is None else warm_connections
+        )
+
+    if replicas.replicas:
+        app.state.replica_checks = asyncio.create_task(replicas.run())
+    await change_feed.start()
+    app.state.read_cache_invalidation = asyncio.create_task(_invalidate_read_cache())
+    if fleet_snapshot is not None:
+        app.state.fleet_snapshot = asyncio.create_task(fleet_snapshot.follow(change_feed))
+    await measurement_partitions.maintain()
+    app.state.partition_maintenance = asyncio.create_task(measurement_partitions.run())
+    app.state.idempotency_purge = asyncio.create_task(idempotency_store.run())
+    readiness.mark_ready()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    readiness.mark_not_ready("shutting down")
+    curve_executor.shutdown()
+    if fleet_snapshot is not None:
+        app.state.fleet_snapshot.cancel()
+    app.state.read_cache_invalidation.cancel()
+    await change_feed.stop()
+    app.state.partition_maintenance.cancel()
+    app.state.idempotency_purge.cancel()
+    if replicas.replicas:
+        app.state.replica_checks.cancel()
+        await replicas.dispose()
+
+
+@app.get("/health/live")
+async def read_liveness():
+    """
+    The process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def read_readiness():
+    """
+    The worker has finished starting up and can reach the database; answers 503 otherwise.
+    """
+    if not readiness.ready:
+        return JSONResponse({"status": "unavailable", "reason": readiness.reason}, status_code=503)
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Bounded as a whole, so a saturated pool makes the worker unready instead of hanging
+    try:
+        await asyncio.wait_for(ping(), READINESS_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, OSError, SQLAlchemyError) as e:
+        logger.warning("Readiness check failed: %s", e)
+        return JSONResponse({"status": "unavailable", "reason": "database"}, status_code=503)
+    return {"status": "ok"}
+
 
 @app.post("/sites/", response_model=SiteSchema, status_code=201)
 async def create_site(site: SiteCreate, db: AsyncSession = Depends(get_db)):
     logger.debug("create_site called with site: %s", site)
 
     # Business Logic Checks (Async)
-    if site.country == "FR":
-        yesterday = date.today() - timedelta(days=1)
-        result = await db.execute(
-            select(Site).filter(
-                Site.country == "FR", Site.installation_date >= yesterday
-            )
-        )
-        if result.scalars().all():  # Check if any results were found
-            raise HTTPException(
-                status_code=400,
-                detail="Only one French site can be installed per day.",
-            )
-
-    if site.country == "IT" and date.today().weekday() not in (5, 6):
-        raise HTTPException(
-            status_code=400, detail="Italian sites can only be installed on weekends."
-        )
-
-    # Check for existing site with the same name
-    existing_site = await db.execute(
-        select(Site).filter(Site.name == site.name)
-    )
-    if existing_site.scalars().first():
-        raise HTTPException(status_code=400, detail="Site name already exists")
+    errors = await site_rules.evaluate(db, [(None, site)])
+    if errors:
+        raise HTTPException(status_code=400, detail=errors[0])
 
     # Create Site object
     db_site = Site(
@@ -70,88 +398,575 @@ async def create_site(site: SiteCreate, db: AsyncSession = Depends(get_db)):
         efficiency=site.efficiency,
         country=site.country
     )
+    db.add(db_site)
+    await db.flush()
+
+    # Quotas are claimed atomically once the site has an id
+    quota_errors = await site_rules.claim_quotas(db, [(db_site.id, site)])
+    if quota_errors:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=quota_errors[db_site.id])
 
     # Add groups to the site
-    for group_id in site.groups:
-        result = await db.execute(
-            select(Group).filter(Group.id == group_id)
+    if site.groups:
+        await db.execute(
+            insert(site_group_association),
+            [{"site_id": db_site.id, "group_id": group_id} for group_id in set(site.groups)],
         )
-        group = result.scalars().first()
-        if group is None:
-            raise HTTPException(status_code=400, detail=f"Group with id {group_id} not found")
-        if group.type == GroupType.GROUP3:
-            raise HTTPException(status_code=400, detail="Sites cannot be associated with group type 'group3'.")
-        db_site.groups.append(group)
+    facts = capacity.site_facts(site, site.groups or [])
+    await capacity.apply_site_changes(db, added=[facts])
+    await changes.record(
+        db, ChangeEntity.SITE, ChangeOp.CREATE, [(db_site.id, facts.country, facts.group_ids)]
+    )
 
-    db.add(db_site)
     await db.commit()
-    await db.refresh(db_site)
+    _touch_snapshot(site_ids=[db_site.id])
+    # Load the groups explicitly: a lazy load would fail once serialization starts
+    await db.refresh(db_site, ["groups"])
     logger.debug("Created site: %s", db_site)
     return db_site
 
 
+@app.post("/sites/bulk", response_model=SiteBulkResult)
+async def bulk_create_sites(sites: List[SiteCreate], db: AsyncSession = Depends(get_db)):
+    """
+    Creates many sites at once and reports the outcome of every item.
+
+    The whole batch is validated with a handful of set-based queries; invalid items are
+    reported and skipped while the valid ones are written in a single transaction.
+    """
+    logger.debug("bulk_create_sites called with %d sites", len(sites))
+    errors = await site_rules.evaluate(db, [(None, site) for site in sites])
+
+    valid = [index for index in range(len(sites)) if index not in errors]
+    site_ids = {}
+    if valid:
+        try:
+            rows = [
+                sites[index].dict(exclude={"groups"}) | {"country": sites[index].country.value}
+                for index in valid
+            ]
+            result = await db.execute(
+                insert(Site).returning(Site.id, sort_by_parameter_order=True), rows
+            )
+            site_ids = dict(zip(valid, result.scalars().all(), strict=True))
+
+            # Sites that did not get their quota slot are removed again within the same
+            # transaction
+            quota_errors = await site_rules.claim_quotas(
+                db, [(site_ids[index], sites[index]) for index in valid]
+            )
+            if quota_errors:
+                await db.execute(delete(Site).where(Site.id.in_(list(quota_errors))))
+                for index in valid:
+                    if site_ids[index] in quota_errors:
+                        errors[index] = quota_errors[site_ids.pop(index)]
+                valid = [index for index in valid if index in site_ids]
+
+            associations = {
+                (site_ids[index], group_id)
+                for index in valid
+                for group_id in sites[index].groups or []
+            }
+            await copy_rows(db, site_group_association, ("site_id", "group_id"), associations)
+            added = {
+                site_ids[index]: capacity.site_facts(sites[index], sites[index].groups or [])
+                for index in valid
+            }
+            await capacity.apply_site_changes(db, added=added.values())
+            await changes.record(
+                db,
+                ChangeEntity.SITE,
+                ChangeOp.CREATE,
+                [(site_id, facts.country, facts.group_ids) for site_id, facts in added.items()],
+            )
+            await db.commit()
+            _touch_snapshot(site_ids=added)
+        except IntegrityError as e:
+            await db.rollback()
+            logger.error("IntegrityError: %s", e)
+            raise _integrity_error(e)
+
+    results = [
+        SiteBulkItemResult(
+            index=index,
+            name=site.name,
+            status="error" if index in errors else "created",
+            id=site_ids.get(index),
+            detail=errors.get(index),
+        )
+        for index, site in enumerate(sites)
+    ]
+    logger.debug("Bulk created %d sites, %d failed", len(valid), len(errors))
+    return SiteBulkResult(created=len(valid), failed=len(errors), results=results)
+
+
+def _site_filters(
+    country: Optional[CountryEnum],
+    installed_from: Optional[date],
+    installed_to: Optional[date],
+    max_power_from: Optional[float],
+    max_power_to: Optional[float],
+    group_id: Optional[List[int]],
+) -> list:
+    """
+    The conditions of the site filters shared by ``list_sites`` and ``bulk_delete_sites``.
+    """
+    conditions = []
+    if country is not None:
+        conditions.append(Site.country == country.value)
+    if installed_from is not None:
+        conditions.append(Site.installation_date >= installed_from)
+    if installed_to is not None:
+        conditions.append(Site.installation_date <= installed_to)
+    if max_power_from is not None:
+        conditions.append(Site.max_power_megawatt >= max_power_from)
+    if max_power_to is not None:
+        conditions.append(Site.max_power_megawatt <= max_power_to)
+    if group_id:
+        conditions.append(
+            select(site_group_association.c.site_id)
+            .where(
+                site_group_association.c.site_id == Site.id,
+                site_group_association.c.group_id.in_(group_id),
+            )
+            .exists()
+        )
+    return conditions
+
+
+@app.get("/sites/", response_model=SitePage)
+async def list_sites(
+    country: Optional[CountryEnum] = None,
+    installed_from: Optional[date] = None,
+    installed_to: Optional[date] = None,
+    max_power_from: Optional[float] = None,
+    max_power_to: Optional[float] = None,
+    group_id: Optional[List[int]] = Query(None),
+    sort: SiteSortField = SiteSortField.ID,
+    order: SortOrder = SortOrder.ASC,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Lists sites matching the filters, one keyset-paginated page at a time.
+
+    Pass the returned ``next_cursor`` back unchanged (with the same filters and sort) to
+    fetch the following page. With ``ids`` the given sites are returned instead, in the
+    requested order and without the unknown ones; filters and paging do not apply.
+    """
+    logger.debug("list_sites called with sort: %s, cursor: %s", sort, cursor)
+    if ids:
+        return json_response(
+            {"items": await _read_batch(site_loader, fetch_sites, db, ids), "next_cursor": None}
+        )
+    sort_column = getattr(Site, sort.value)
+    try:
+        after = decode_cursor(cursor, sort.value, sort_column) if cursor else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if _snapshot_serves(db) and sort != SiteSortField.NAME:
+        filters = SiteFilter(
+            country and country.value,
+            installed_from,
+            installed_to,
+            max_power_from,
+            max_power_to,
+            group_id,
+        )
+        items = await fleet_snapshot.page(
+            filters, sort.value, order == SortOrder.DESC, after, limit
+        )
+    else:
+        conditions = _site_filters(
+            country, installed_from, installed_to, max_power_from, max_power_to, group_id
+        )
+        stmt = select(*SITE_COLUMNS).where(*conditions)
+        stmt = keyset_page(stmt, sort_column, Site.id, order == SortOrder.DESC, after, limit)
+        result = await db.execute(stmt)
+        items = await site_dicts(db, result.all())
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(sort.value, last[sort.value], last["id"])
+    return json_response({"items": items, "next_cursor": next_cursor})
+
+
+@app.get("/sites/count", response_model=SiteCount)
+async def count_sites(
+    country: Optional[CountryEnum] = None,
+    installed_from: Optional[date] = None,
+    installed_to: Optional[date] = None,
+    max_power_from: Optional[float] = None,
+    max_power_to: Optional[float] = None,
+    group_id: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Counts the sites matching the ``list_sites`` filters.
+    """
+    if _snapshot_serves(db):
+        filters = SiteFilter(
+            country and country.value,
+            installed_from,
+            installed_to,
+            max_power_from,
+            max_power_to,
+            group_id,
+        )
+        return {"count": await fleet_snapshot.count(filters)}
+    conditions = _site_filters(
+        country, installed_from, installed_to, max_power_from, max_power_to, group_id
+    )
+    result = await db.execute(select(func.count()).select_from(Site).where(*conditions))
+    return {"count": result.scalar()}
+
+
+EXPORT_COLUMNS = (
+    "id",
+    "name",
+    "installation_date",
+    "max_power_megawatt",
+    "min_power_megawatt",
+    "useful_energy_at_1_megawatt",
+    "efficiency",
+    "country",
+    "groups",
+)
+EXPORT_BATCH_SIZE = 1000
+
+
+async def _export_rows(export_format: ExportFormat):
+    """
+    Streams every site, with its group ids, as encoded chunks of ``EXPORT_BATCH_SIZE`` rows.
+
+    Rows come from a server-side cursor, so only one batch is held in memory at a time. The
+    session is opened here rather than through ``get_db`` because it has to outlive the
+    handler while the response body is being sent.
+    """
+    group_ids = func.array(
+        select(site_group_association.c.group_id)
+        .where(site_group_association.c.site_id == Site.id)
+        .order_by(site_group_association.c.group_id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(*(getattr(Site, column) for column in EXPORT_COLUMNS[:-1]), group_ids)
+        .order_by(Site.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    if export_format == ExportFormat.CSV:
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    async with replicas.session() as session, session.begin():
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            if export_format == ExportFormat.CSV:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([*row[:-1], ";".join(map(str, row[-1]))])
+                yield buffer.getvalue()
+            else:
+                records = (dict(zip(EXPORT_COLUMNS, row, strict=True)) for row in rows)
+                yield "".join(
+                    json.dumps(record, default=date.isoformat) + "\n" for record in records
+                )
+
+
+@app.get("/sites/export")
+async def export_sites(export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format")):
+    """
+    Exports the whole fleet as NDJSON or CSV without buffering it in memory.
+    """
+    logger.debug("export_sites called with format: %s", export_format)
+    media_type = "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=sites.{export_format.value}"},
+    )
+
+
+@app.get("/sites/search", response_model=List[SiteSearchHit])
+async def search_sites(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Typeahead search on site names: names starting with ``q`` (case-insensitive) first, then
+    names with a word similar to ``q`` (three characters or more), each with its score.
+    """
+    hits = await search_names(db, SITE_SEARCH_COLUMNS, Site.name, Site.id, q, limit)
+    return json_response(
+        [
+            {
+                "id": row.id,
+                "name": row.name,
+                "country": row.country,
+                "match": match.value,
+                "score": round(row.score, 3),
+            }
+            for row, match in hits
+        ]
+    )
+
+
 @app.get("/sites/{site_id}", response_model=SiteSchema)
-async def read_site(site_id: int, db: AsyncSession = Depends(get_db)):
+async def read_site(site_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     logger.debug("read_site called with site_id: %d", site_id)
-    async with db.begin():
-        result = await db.execute(
-            select(Site).options(joinedload(Site.groups)).where(Site.id == site_id)
-        )
-        db_site = result.scalars().first()
-        logger.debug("Read site: %s", db_site)
-        if db_site is None:
-            raise HTTPException(status_code=404, detail="Site not found")
-        return db_site
+    cached = _cached(db, ("site", site_id))
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    generation = read_cache.generation()
+    site = (await _load_many(site_loader, fetch_sites, db, [site_id])).get(site_id)
+    logger.debug("Read site: %s", site)
+    if site is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    body = dumps(site)
+    tags = [("group", group["id"]) for group in site["groups"]]
+
+    cached = CachedBody(body, make_etag(body))
+    if _cacheable(db):
+        read_cache.set(("site", site_id), cached, tags=tags, generation=generation)
+    return _cached_response(request, cached)
+
+
+def _body_errors(e: ValidationError) -> RequestValidationError:
+    """
+    Reports the merged values of a partial update failing validation like FastAPI reports an
+    invalid body.
+    """
+    errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+    return RequestValidationError(errors)
+
 
 @app.patch("/sites/{site_id}", response_model=SiteSchema)
-async def update_site(site_id: int, site: SiteCreate, db: AsyncSession = Depends(get_db)):
+async def update_site(site_id: int, site: SiteUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Updates the fields sent and leaves the others alone. Memberships are only touched when
+    ``groups`` is sent, and then only the groups joined or left are written.
+    """
     logger.debug("update_site called with site_id: %d and site: %s", site_id, site)
+    patch = site.dict(exclude_unset=True)
     try:
-        result = await db.execute(
-            select(Site)
-            .where(Site.id == site_id)
-            .options(joinedload(Site.groups))
-        )
-        db_site = result.scalars().first()
+        db_site = await db.get(Site, site_id)
         if db_site is None:
             raise HTTPException(status_code=404, detail="Site not found")
+        if not patch:
+            await db.refresh(db_site, ["groups"])
+            return db_site
+
+        before = (await memberships.load_sites(db, [site_id]))[site_id]
+        # Fields not sent keep their stored value, but may not be nulled either
+        values = {
+            field: getattr(db_site, field) for field in SiteCreate.model_fields.keys() - {"groups"}
+        }
+        values.update(patch, groups=patch.get("groups") or [])
+        try:
+            merged = SiteCreate(**values)
+        except ValidationError as e:
+            raise _body_errors(e)
+
+        # Only the rules reading a field the patch changes can start failing
+        changed = {
+            field
+            for field in patch.keys() - {"groups"}
+            if getattr(merged, field) != getattr(db_site, field)
+        }
+        if "groups" in patch and set(merged.groups) != set(before.group_ids):
+            changed.add("groups")
+        errors = await site_rules.evaluate(db, [(site_id, merged)], changed)
+        if errors:
+            raise HTTPException(status_code=400, detail=errors[0])
+
+        moved = (
+            merged.country != db_site.country
+            or merged.installation_date != db_site.installation_date
+        )
+        for key, value in patch.items():
+            if key != "groups":
+                setattr(db_site, key, value)
+
+        group_ids = before.group_ids
+        if "groups" in patch:
+            wanted = set(merged.groups)
+            await memberships.delete_pairs(db, [site_id], set(group_ids) - wanted)
+            await memberships.insert_pairs(db, [site_id], wanted - set(group_ids))
+            group_ids = tuple(wanted)
 
-        for key, value in site.dict().items():
-            setattr(db_site, key, value)
+        # A new country or installation date has to claim its quotas again
+        if moved:
+            await release(db, [site_id])
+            await db.flush()
+            quota_errors = await site_rules.claim_quotas(db, [(site_id, merged)])
+            if quota_errors:
+                await db.rollback()
+                raise HTTPException(status_code=400, detail=quota_errors[site_id])
 
+        added = capacity.site_facts(merged, group_ids)
+        await capacity.apply_site_changes(db, removed=[before], added=[added])
+        # Subscribers of the groups the site left are told as well
+        await changes.record(
+            db,
+            ChangeEntity.SITE,
+            ChangeOp.UPDATE,
+            [(site_id, added.country, before.group_ids + added.group_ids)],
+        )
         await db.commit()
-        await db.refresh(db_site)
+        read_cache.invalidate(("site", site_id))
+        _touch_snapshot(site_ids=[site_id])
+        await db.refresh(db_site, ["groups"])
         logger.debug("Updated site: %s", db_site)
         return db_site
 
     except IntegrityError as e:
         await db.rollback()
         logger.error("IntegrityError: %s", e)
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _integrity_error(e)
 
 
-@app.delete("/sites/{site_id}")
-async def delete_site(site_id: int, db: AsyncSession = Depends(get_db)):
-    logger.debug("delete_site called with site_id: %d", site_id)
-    try:
-        result = await db.execute(
-            select(Site)
-            .where(Site.id == site_id)
-            .options(joinedload(Site.groups))
+MAX_MEMBERSHIP_IDS = 50_000
+
+
+async def _change_memberships(
+    db: AsyncSession,
+    site_ids: List[int],
+    add: List[int] = (),
+    remove: List[int] = (),
+    missing_status: int = 400,
+) -> MembershipResult:
+    """
+    Adds the sites to the groups of ``add`` and takes them out of the groups of ``remove`` in
+    one transaction, with one statement per direction whatever the number of sites.
+    """
+    if max(len(site_ids), len(add), len(remove)) > MAX_MEMBERSHIP_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_MEMBERSHIP_IDS} ids per request"
         )
-        db_site = result.scalars().first()
-        if db_site is None:
-            raise HTTPException(status_code=404, detail="Site not found")
+    before = await memberships.load_sites(db, site_ids)
+    missing = [site_id for site_id in site_ids if site_id not in before]
+    if missing:
+        raise HTTPException(
+            status_code=missing_status, detail=f"Site with id {missing[0]} not found"
+        )
+    if add:
+        error = await site_rules.check_memberships(
+            db, {facts.country for facts in before.values()}, add
+        )
+        if error is not None:
+            raise HTTPException(status_code=400, detail=error)
 
-        await db.delete(db_site)
+    try:
+        added, removed, after = await memberships.change_memberships(db, before, add, remove)
+        await changes.record(
+            db,
+            ChangeEntity.SITE,
+            ChangeOp.UPDATE,
+            [
+                (site_id, facts.country, before[site_id].group_ids + facts.group_ids)
+                for site_id, facts in after.items()
+            ],
+        )
         await db.commit()
-        logger.debug("Deleted site: %d", site_id)
-        return {"message": "Site deleted successfully"}
-
     except IntegrityError as e:
+        # A group or site was deleted by a concurrent request since the checks above
         await db.rollback()
         logger.error("IntegrityError: %s", e)
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _integrity_error(e)
+    for site_id in after:
+        read_cache.invalidate(("site", site_id))
+    _touch_snapshot(site_ids=after)
+    return MembershipResult(added=len(added), removed=len(removed))
+
+
+@app.post("/sites/{site_id}/groups", response_model=MembershipResult)
+async def add_site_groups(
+    site_id: int, group_ids: List[int] = Body(...), db: AsyncSession = Depends(get_db)
+):
+    """
+    Adds the site to the groups of ``group_ids``; groups it already belongs to are skipped.
+    """
+    logger.debug("add_site_groups called with site_id: %d and %d groups", site_id, len(group_ids))
+    return await _change_memberships(db, [site_id], add=group_ids, missing_status=404)
+
+
+@app.delete("/sites/{site_id}/groups", response_model=MembershipResult)
+async def remove_site_groups(
+    site_id: int, group_ids: List[int] = Body(...), db: AsyncSession = Depends(get_db)
+):
+    """
+    Takes the site out of the groups of ``group_ids``; groups it is not in are skipped.
+    """
+    logger.debug(
+        "remove_site_groups called with site_id: %d and %d groups", site_id, len(group_ids)
+    )
+    return await _change_memberships(db, [site_id], remove=group_ids, missing_status=404)
+
+
+async def _record_site_deletes(db: AsyncSession, removed: dict) -> None:
+    await changes.record(
+        db,
+        ChangeEntity.SITE,
+        ChangeOp.DELETE,
+        [(site_id, facts.country, facts.group_ids) for site_id, facts in removed.items()],
+    )
+
+
+@app.delete("/sites/", response_model=DeleteResult)
+async def bulk_delete_sites(
+    ids: Optional[List[int]] = Query(None),
+    country: Optional[CountryEnum] = None,
+    installed_from: Optional[date] = None,
+    installed_to: Optional[date] = None,
+    max_power_from: Optional[float] = None,
+    max_power_to: Optional[float] = None,
+    group_id: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Deletes the sites given by ``ids`` and/or matching the ``list_sites`` filters, with one
+    statement. At least one selector is required, so a bare request cannot empty the table.
+    """
+    conditions = _site_filters(
+        country, installed_from, installed_to, max_power_from, max_power_to, group_id
+    )
+    if ids:
+        conditions.append(id_in(Site.id, ids))
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Give ids or at least one filter")
+    logger.debug("bulk_delete_sites called with %d conditions", len(conditions))
+
+    removed = await delete_sites(db, and_(*conditions))
+    await _record_site_deletes(db, removed)
+    await db.commit()
+    for site_id in removed:
+        read_cache.invalidate(("site", site_id))
+    _touch_snapshot(site_ids=removed)
+    logger.debug("Deleted %d sites", len(removed))
+    return DeleteResult(deleted=len(removed))
+
+
+@app.delete("/sites/{site_id}")
+async def delete_site(site_id: int, db: AsyncSession = Depends(get_db)):
+    logger.debug("delete_site called with site_id: %d", site_id)
+    removed = await delete_sites(db, Site.id == site_id)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Site not found")
+    await _record_site_deletes(db, removed)
+    await db.commit()
+    read_cache.invalidate(("site", site_id))
+    _touch_snapshot(site_ids=[site_id])
+    logger.debug("Deleted site: %d", site_id)
+    return {"message": "Site deleted successfully"}
 
 
 @app.post("/groups/", response_model=GroupSchema, status_code=201)
@@ -165,13 +980,34 @@ async def create_group(group: GroupCreate, db: AsyncSession = Depends(get_db)):
     if existing_group.scalars().first():
         raise HTTPException(status_code=400, detail="Group already exists")
 
+    if group.parent_id is not None:
+        parent = await db.execute(select(Group.id).where(Group.id == group.parent_id))
+        if parent.first() is None:
+            raise HTTPException(
+                status_code=400, detail=f"Parent group with id {group.parent_id} not found"
+            )
+
     # Create the new Group instance
-    db_group = Group(name=group.name, type=group.type)
+    db_group = Group(name=group.name, type=group.type, parent_id=group.parent_id)
 
-    # Add the group to the database session
-    db.add(db_group)
-    # Commit the transaction (save the changes to the database)
-    await db.commit()
+    try:
+        # Add the group to the database session
+        db.add(db_group)
+        await db.flush()
+        await changes.record(
+            db,
+            ChangeEntity.GROUP,
+            ChangeOp.CREATE,
+            [(db_group.id, None, [db_group.id, group.parent_id])],
+        )
+        # Commit the transaction (save the changes to the database)
+        await db.commit()
+    except IntegrityError as e:
+        # A concurrent write took the name or deleted the parent since the checks above
+        await db.rollback()
+        logger.error("IntegrityError: %s", e)
+        raise _integrity_error(e)
+    _touch_snapshot(group_ids=[db_group.id])
     # Refresh the group object to get the auto-generated ID
     await db.refresh(db_group)
 
@@ -180,43 +1016,275 @@ async def create_group(group: GroupCreate, db: AsyncSession = Depends(get_db)):
     return db_group
 
 
-@app.get("/groups/", response_model=List[GroupSchema])
-async def read_groups(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Group))
-    groups = result.scalars().all()
-    return groups
+@app.get("/groups/", response_model=GroupPage)
+async def read_groups(
+    type: Optional[GroupType] = None,
+    parent_id: Optional[int] = None,
+    sort: GroupSortField = GroupSortField.ID,
+    order: SortOrder = SortOrder.ASC,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Lists groups, one keyset-paginated page at a time, or the groups given by ``ids`` (see
+    ``list_sites``).
+    """
+    logger.debug("read_groups called with sort: %s, cursor: %s", sort, cursor)
+    if ids:
+        return json_response(
+            {"items": await _read_batch(group_loader, fetch_groups, db, ids), "next_cursor": None}
+        )
+    sort_column = getattr(Group, sort.value)
+    try:
+        after = decode_cursor(cursor, sort.value, sort_column) if cursor else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stmt = select(*GROUP_COLUMNS)
+    if type is not None:
+        stmt = stmt.where(Group.type == type.value)
+    if parent_id is not None:
+        stmt = stmt.where(Group.parent_id == parent_id)
+
+    stmt = keyset_page(stmt, sort_column, Group.id, order == SortOrder.DESC, after, limit)
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort.value, getattr(last, sort.value), last.id)
+    return json_response(
+        {"items": [group_dict(row) for row in rows], "next_cursor": next_cursor}
+    )
+
+
+@app.get("/groups/search", response_model=List[GroupSearchHit])
+async def search_groups(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Typeahead search on group names, ranked as in ``search_sites``.
+    """
+    hits = await search_names(db, GROUP_SEARCH_COLUMNS, Group.name, Group.id, q, limit)
+    return json_response(
+        [
+            {
+                "id": row.id,
+                "name": row.name,
+                "type": row.type,
+                "match": match.value,
+                "score": round(row.score, 3),
+            }
+            for row, match in hits
+        ]
+    )
 
 
 @app.get("/groups/{group_id}", response_model=GroupSchema)
-async def read_group(group_id: int, db: AsyncSession = Depends(get_db)):
+async def read_group(group_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     logger.debug("read_group called with group_id: %d", group_id)
-    result = await db.execute(select(Group).where(Group.id == group_id))
-    db_group = result.scalars().first()
-    logger.debug("Read group: %s", db_group)
-    if db_group is None:
+    cached = _cached(db, ("group", group_id))
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    generation = read_cache.generation()
+    group = (await _load_many(group_loader, fetch_groups, db, [group_id])).get(group_id)
+    logger.debug("Read group: %s", group)
+    if group is None:
         raise HTTPException(status_code=404, detail="Group not found")
-    return db_group
+
+    body = dumps(group)
+    cached = CachedBody(body, make_etag(body))
+    if _cacheable(db):
+        read_cache.set(("group", group_id), cached, generation=generation)
+    return _cached_response(request, cached)
+
+
+@app.get("/groups/{group_id}/descendants", response_model=List[GroupNode])
+async def read_group_descendants(group_id: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    Lists every group below the given one, nearest levels first.
+    """
+    logger.debug("read_group_descendants called with group_id: %d", group_id)
+    tree = descendants_cte(group_id)
+    result = await db.execute(
+        select(Group.id, Group.name, Group.type, Group.parent_id, tree.c.depth)
+        .join(tree, Group.id == tree.c.id)
+        .order_by(tree.c.depth, Group.id)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return [row._asdict() for row in rows if row.depth > 0]
+
+
+@app.get("/groups/{group_id}/ancestors", response_model=List[GroupNode])
+async def read_group_ancestors(group_id: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    Lists the chain of groups above the given one, from its parent up to the root.
+    """
+    logger.debug("read_group_ancestors called with group_id: %d", group_id)
+    tree = ancestors_cte(group_id)
+    result = await db.execute(
+        select(Group.id, Group.name, Group.type, Group.parent_id, tree.c.depth)
+        .join(tree, Group.id == tree.c.id)
+        .order_by(tree.c.depth)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return [row._asdict() for row in rows if row.depth > 0]
+
+
+@app.get("/groups/{group_id}/sites", response_model=SitePage)
+async def read_group_sites(
+    group_id: int,
+    recursive: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Lists the sites of a group, or of the group and all its descendants when ``recursive``.
+    """
+    logger.debug("read_group_sites called with group_id: %d, recursive: %s", group_id, recursive)
+    try:
+        after = decode_cursor(cursor, "id", Site.id) if cursor else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if recursive:
+        tree = descendants_cte(group_id)
+        member_of = site_group_association.c.group_id.in_(select(tree.c.id))
+    else:
+        member_of = site_group_association.c.group_id == group_id
+    stmt = select(*SITE_COLUMNS).where(
+        select(site_group_association.c.site_id)
+        .where(site_group_association.c.site_id == Site.id, member_of)
+        .exists()
+    )
+    stmt = keyset_page(stmt, Site.id, Site.id, False, after, limit)
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    # Only an empty page needs telling apart an unknown group from an empty one
+    if not rows and await db.get(Group, group_id) is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor("id", rows[-1].id, rows[-1].id)
+    return json_response({"items": await site_dicts(db, rows), "next_cursor": next_cursor})
+
+
+async def _get_group_or_404(db: AsyncSession, group_id: int) -> None:
+    if await db.get(Group, group_id) is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+
+@app.post("/groups/{group_id}/sites", response_model=MembershipResult)
+async def add_group_sites(
+    group_id: int,
+    site_ids: List[int] = Body(...),
+    move_from: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Adds the sites of ``site_ids`` to the group; sites already in it are skipped.
+
+    With ``move_from``, the sites are taken out of that group in the same transaction, so
+    moving any number of sites between two groups is one request.
+    """
+    logger.debug("add_group_sites called with group_id: %d and %d sites", group_id, len(site_ids))
+    await _get_group_or_404(db, group_id)
+    remove = [move_from] if move_from is not None else []
+    return await _change_memberships(db, site_ids, add=[group_id], remove=remove)
+
+
+@app.delete("/groups/{group_id}/sites", response_model=MembershipResult)
+async def remove_group_sites(
+    group_id: int, site_ids: List[int] = Body(...), db: AsyncSession = Depends(get_db)
+):
+    """
+    Takes the sites of ``site_ids`` out of the group; sites not in it are skipped.
+    """
+    logger.debug(
+        "remove_group_sites called with group_id: %d and %d sites", group_id, len(site_ids)
+    )
+    await _get_group_or_404(db, group_id)
+    return await _change_memberships(db, site_ids, remove=[group_id])
 
 
 @app.patch("/groups/{group_id}", response_model=GroupSchema)
-async def update_group(group_id: int, group: GroupCreate, db: AsyncSession = Depends(get_db)):
+async def update_group(group_id: int, group: GroupUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Updates the fields sent and leaves the others alone; sending ``parent_id: null`` turns
+    the group into a root.
+    """
     logger.debug("update_group called with group_id: %d and group: %s", group_id, group)
+    patch = group.dict(exclude_unset=True)
     try:
         result = await db.execute(select(Group).where(Group.id == group_id))
         db_group = result.scalars().first()
         if db_group is None:
             raise HTTPException(status_code=404, detail="Group not found")
 
+        current = {field: getattr(db_group, field) for field in GroupCreate.model_fields}
+        try:
+            group = GroupCreate(**{**current, **patch})
+        except ValidationError as e:
+            raise _body_errors(e)
+
         # Check if updated group name already exists (excluding current group)
         if group.name != db_group.name:
             existing_group = await db.execute(select(Group).filter(Group.name == group.name))
             if existing_group.scalars().first():
                 raise HTTPException(status_code=400, detail="Group name already exists")
 
-        for attr, value in group.dict().items():
+        # A group cannot be moved below itself or one of its descendants
+        if group.parent_id is not None and group.parent_id != db_group.parent_id:
+            descendants = descendants_cte(group_id)
+            cycle = await db.execute(
+                select(descendants.c.id).where(descendants.c.id == group.parent_id).limit(1)
+            )
+            if cycle.first():
+                raise HTTPException(
+                    status_code=400,
+                    detail="A group cannot be moved under itself or one of its descendants",
+                )
+
+        # The rollups above the old and the new position no longer match their sites
+        stale = []
+        if group.parent_id != db_group.parent_id:
+            for parent_id in (db_group.parent_id, group.parent_id):
+                if parent_id is not None:
+                    ancestors = ancestors_cte(parent_id)
+                    stale.extend((await db.execute(select(ancestors.c.id))).scalars())
+
+        old_parent_id = db_group.parent_id
+        for attr, value in patch.items():
             setattr(db_group, attr, value)
 
+        if stale:
+            await db.flush()
+            await capacity.refresh_groups(db, stale)
+        await changes.record(
+            db,
+            ChangeEntity.GROUP,
+            ChangeOp.UPDATE,
+            [(group_id, None, [group_id, old_parent_id, group.parent_id])],
+        )
         await db.commit()
+        read_cache.invalidate(("group", group_id))
+        read_cache.invalidate_tag(("group", group_id))
+        _touch_snapshot(group_ids=[group_id])
         await db.refresh(db_group)
         logger.debug("Updated group: %s", db_group)
         return db_group
@@ -224,38 +1292,522 @@ async def update_group(group_id: int, group: GroupCreate, db: AsyncSession = Dep
     except IntegrityError as e:
         await db.rollback()
         logger.error("IntegrityError: %s", e)
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _integrity_error(e)
+
+
+async def _delete_groups(db: AsyncSession, condition, children: ChildPolicy) -> DeleteResult:
+    try:
+        deleted, moved = await delete_groups(db, condition, children)
+    except GroupHasChildrenError as e:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    await changes.record(
+        db,
+        ChangeEntity.GROUP,
+        ChangeOp.UPDATE,
+        [(group_id, None, [group_id, parent_id]) for group_id, parent_id in moved.items()],
+    )
+    await changes.record(
+        db,
+        ChangeEntity.GROUP,
+        ChangeOp.DELETE,
+        [(group_id, None, [group_id, parent_id]) for group_id, parent_id in deleted.items()],
+    )
+    await db.commit()
+    # Cached sites embed their groups, including the parent of the moved ones
+    for group_id in [*deleted, *moved]:
+        read_cache.invalidate(("group", group_id))
+        read_cache.invalidate_tag(("group", group_id))
+    _touch_snapshot(group_ids=[*deleted, *moved])
+    return DeleteResult(deleted=len(deleted), children_updated=len(moved))
+
+
+@app.delete("/groups/", response_model=DeleteResult)
+async def bulk_delete_groups(
+    ids: Optional[List[int]] = Query(None),
+    type: Optional[GroupType] = None,
+    parent_id: Optional[int] = None,
+    children: ChildPolicy = ChildPolicy.ORPHAN,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Deletes the groups given by ``ids`` and/or matching the ``read_groups`` filters.
+
+    ``children`` decides what happens to the child groups left behind: ``orphan`` makes them
+    roots, ``reparent`` moves them to the nearest surviving ancestor, ``cascade`` deletes the
+    whole subtrees and ``restrict`` refuses with 409. Memberships of deleted groups are
+    removed by the database.
+    """
+    conditions = []
+    if ids:
+        conditions.append(id_in(Group.id, ids))
+    if type is not None:
+        conditions.append(Group.type == type.value)
+    if parent_id is not None:
+        conditions.append(Group.parent_id == parent_id)
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Give ids or at least one filter")
+    logger.debug("bulk_delete_groups called with children: %s", children)
+
+    result = await _delete_groups(db, and_(*conditions), children)
+    logger.debug("Deleted %d groups", result.deleted)
+    return result
 
 
 @app.delete("/groups/{group_id}", status_code=204)
-async def delete_group(group_id: int, db: AsyncSession = Depends(get_db)):
+async def delete_group(
+    group_id: int,
+    children: ChildPolicy = ChildPolicy.ORPHAN,
+    db: AsyncSession = Depends(get_db),
+):
     logger.debug("delete_group called with group_id: %d", group_id)
+    result = await _delete_groups(db, Group.id == group_id, children)
+    if not result.deleted:
+        raise HTTPException(status_code=404, detail="Group not found")
+    logger.debug("Deleted group: %d", group_id)
+    return {"message": "Group deleted successfully"}
+
+@app.post("/groups/bulk_create", response_model=GroupBulkResult, status_code=201)
+async def bulk_create_groups(
+    groups: List[GroupCreate],
+    key: GroupConflictKey = GroupConflictKey.ID,
+    on_conflict: ConflictAction = ConflictAction.SKIP,
+    chunk_size: int = Query(5000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upserts groups with one ``INSERT ... ON CONFLICT`` per chunk of ``chunk_size`` items.
+
+    Existing groups are matched on ``key`` and skipped or updated according to
+    ``on_conflict``; updates that change nothing count as skipped, as do repeated keys (the
+    last occurrence wins). Parents are written before their children, so a whole tree can
+    be loaded in one call. Everything runs in one transaction, so a failed call can simply
+    be retried.
+    """
+    logger.debug("bulk_create_groups called with %d groups", len(groups))
+    unique = list({getattr(group, key.value): group for group in groups}.values())
     try:
-        result = await db.execute(select(Group).where(Group.id == group_id))
-        db_group = result.scalars().first()
-        if db_group is None:
-            raise HTTPException(status_code=404, detail="Group not found")
+        ordered = parents_first(unique, lambda group: group.id, lambda group: group.parent_id)
+    except HierarchyCycleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Clear existing sites from the group
-        db_group.sites = []
+    key_column = getattr(Group, key.value)
+    update_columns = ()
+    if on_conflict == ConflictAction.UPDATE:
+        update_columns = tuple(
+            column for column in ("name", "type", "parent_id") if column != key.value
+        )
 
-        await db.delete(db_group)
-        await db.commit()
-        logger.debug("Deleted group: %d", group_id)
-        return {"message": "Group deleted successfully"}
+    chunks, created_ids, updated_ids, old_parents = [], [], [], {}
+    try:
+        for start in range(0, len(ordered), chunk_size):
+            chunk = ordered[start:start + chunk_size]
+            if update_columns:
+                # Moving existing groups changes the capacity rollups of their old parents
+                result = await db.execute(
+                    select(Group.id, Group.parent_id).where(
+                        key_column.in_([getattr(group, key.value) for group in chunk])
+                    )
+                )
+                old_parents.update(result.all())
+            rows = [
+                {
+                    "id": group.id,
+                    "name": group.name,
+                    "type": group.type.value,
+                    "parent_id": group.parent_id,
+                }
+                for group in chunk
+            ]
+            created, updated = await upsert_rows(
+                db, Group.__table__, rows, key.value, update_columns
+            )
+            created_ids.extend(created)
+            updated_ids.extend(updated)
+            chunks.append(
+                GroupBulkChunkResult(
+                    chunk=len(chunks),
+                    created=len(created),
+                    updated=len(updated),
+                    skipped=len(chunk) - len(created) - len(updated),
+                )
+            )
+
+        if any(chunk.created for chunk in chunks):
+            # Explicit ids leave the serial sequence behind
+            await db.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('groups', 'id'), "
+                    "(SELECT max(id) FROM groups))"
+                )
+            )
+
+        new_parents = {}
+        if updated_ids:
+            result = await db.execute(
+                select(Group.id, Group.parent_id).where(Group.id.in_(updated_ids))
+            )
+            new_parents = dict(result.all())
+        moved = [
+            group_id
+            for group_id, new_parent_id in new_parents.items()
+            if new_parent_id is not None and new_parent_id != old_parents.get(group_id)
+        ]
+        if moved:
+            # The payload alone may be acyclic and still put an existing group below one of
+            # its existing descendants: a moved group must not be found above itself
+            pairs = ancestor_pairs_cte(moved)
+            result = await db.execute(
+                select(pairs.c.start_id)
+                .where(pairs.c.id == pairs.c.start_id, pairs.c.depth > 0)
+                .distinct()
+            )
+            cycles = sorted(result.scalars())
+            if cycles:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        "Groups cannot be moved under themselves or one of their "
+                        f"descendants: {cycles}"
+                    ),
+                )
+        stale_parents = {
+            parent_id
+            for group_id, new_parent_id in new_parents.items()
+            if new_parent_id != old_parents.get(group_id)
+            for parent_id in (old_parents.get(group_id), new_parent_id)
+            if parent_id is not None
+        }
+        if stale_parents:
+            pairs = ancestor_pairs_cte(stale_parents)
+            stale = await db.execute(select(pairs.c.id).distinct())
+            await capacity.refresh_groups(db, stale.scalars().all())
 
+        parents = {group.id: group.parent_id for group in unique}
+        await changes.record(
+            db,
+            ChangeEntity.GROUP,
+            ChangeOp.CREATE,
+            [(group_id, None, [group_id, parents.get(group_id)]) for group_id in created_ids],
+        )
+        await changes.record(
+            db,
+            ChangeEntity.GROUP,
+            ChangeOp.UPDATE,
+            [
+                (group_id, None, [group_id, old_parents.get(group_id), new_parents[group_id]])
+                for group_id in updated_ids
+            ],
+        )
+        await db.commit()
     except IntegrityError as e:
         await db.rollback()
         logger.error("IntegrityError: %s", e)
-        raise HTTPException(status_code=400, detail=str(e))
+        raise _integrity_error(e)
 
-@app.post("/groups/bulk_create", status_code=201)
-async def bulk_create_groups(groups: List[GroupCreate], db: AsyncSession = Depends(get_db)):
-    for group_data in groups:
-        existing_group = await db.execute(select(Group).filter(Group.id == group_data.id))
-        if existing_group.scalars().first():
-            continue  # Skip if the group already exists
-        db_group = Group(id=group_data.id, name=group_data.name, type=group_data.type)
-        db.add(db_group)
+    for group_id in updated_ids:
+        read_cache.invalidate(("group", group_id))
+        read_cache.invalidate_tag(("group", group_id))
+    _touch_snapshot(group_ids=[*created_ids, *updated_ids])
+
+    created = sum(chunk.created for chunk in chunks)
+    updated = len(updated_ids)
+    logger.debug("Bulk upserted groups: %d created, %d updated", created, updated)
+    return GroupBulkResult(
+        created=created,
+        updated=updated,
+        skipped=len(groups) - created - updated,
+        chunks=chunks,
+    )
+
+
+MAX_MEASUREMENTS_PER_REQUEST = 50_000
+MAX_MEASUREMENT_POINTS = 10_000
+
+
+@app.post("/measurements/bulk", response_model=MeasurementBulkResult)
+async def ingest_measurements(
+    readings: List[MeasurementCreate], db: AsyncSession = Depends(get_db)
+):
+    """
+    Stores site readings, thousands at a time, and reports the rejected ones.
+
+    Readings are kept per minute: a second reading for the same site and minute replaces the
+    first, so a failed batch can simply be sent again. Readings of unknown sites or outside
+    the retention window are rejected.
+    """
+    logger.debug("ingest_measurements called with %d readings", len(readings))
+    if len(readings) > MAX_MEASUREMENTS_PER_REQUEST:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_MEASUREMENTS_PER_REQUEST} readings per request",
+        )
+    first, last = measurement_partitions.window()
+    earliest = datetime.combine(first, dt_time(), timezone.utc)
+    latest = datetime.combine(last + timedelta(days=1), dt_time(), timezone.utc)
+
+    result = await db.execute(
+        select(Site.id).where(id_in(Site.id, {reading.site_id for reading in readings}))
+    )
+    known = set(result.scalars())
+    rows, errors = [], []
+    for index, reading in enumerate(readings):
+        measured_at = as_utc(reading.measured_at).replace(second=0, microsecond=0)
+        if reading.site_id not in known:
+            errors.append(MeasurementBulkItemError(index=index, detail="Site not found"))
+        elif not earliest <= measured_at < latest:
+            errors.append(
+                MeasurementBulkItemError(index=index, detail="Outside the retention window")
+            )
+        else:
+            rows.append(
+                (
+                    reading.site_id,
+                    measured_at,
+                    reading.power_megawatt,
+                    reading.energy_megawatt_hour,
+                )
+            )
+
+    await measurement_partitions.ensure({row[1].date() for row in rows})
+    await telemetry.ingest(db, rows)
     await db.commit()
-    return {"message": "Groups created successfully"}
\ No newline at end of file
+    logger.debug("Ingested %d readings, rejected %d", len(rows), len(errors))
+    return MeasurementBulkResult(accepted=len(rows), rejected=len(errors), errors=errors)
+
+
+@app.get("/sites/{site_id}/measurements", response_model=List[MeasurementPoint])
+async def read_site_measurements(
+    site_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: MeasurementBucket = MeasurementBucket.HOUR,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Readings of a site over ``[start, end)`` (the last day by default), downsampled in the
+    database to the average, minimum and maximum power and the total energy per ``bucket``.
+    Buckets without readings are left out.
+    """
+    end = as_utc(end) if end is not None else datetime.now(timezone.utc)
+    start = as_utc(start) if start is not None else end - timedelta(days=1)
+    size = BUCKET_SIZES[bucket]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / size > MAX_MEASUREMENT_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"More than {MAX_MEASUREMENT_POINTS} buckets, use a larger bucket",
+        )
+
+    points = await telemetry.series(db, site_id, start, end, size)
+    if not points and await db.get(Site, site_id) is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return json_response(points)
+
+
+@app.get("/analytics/capacity", response_model=List[CapacityRow])
+async def read_capacity(
+    by: CapacityDimension = CapacityDimension.COUNTRY, db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Site count and installed power per country, installation month or group.
+
+    Reads the summary rows kept up to date by every write, so the cost does not grow with the
+    number of sites. Group figures include the sites of all descendant groups.
+    """
+    result = await db.execute(
+        select(CapacitySummary)
+        .where(CapacitySummary.dimension == by.value, CapacitySummary.site_count > 0)
+        .order_by(
+            cast(CapacitySummary.key, Integer)
+            if by == CapacityDimension.GROUP
+            else CapacitySummary.key
+        )
+    )
+    return result.scalars().all()
+
+
+@app.get("/analytics/energy-curves", response_model=List[EnergyCurve])
+async def read_energy_curves(
+    by: EnergyCurveScope = EnergyCurveScope.FLEET,
+    group_id: Optional[int] = None,
+    points: int = Query(21, ge=2, le=1001),
+    max_setpoint: Optional[float] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Fleet power and useful energy over a grid of per-site power setpoints, for the whole
+    fleet, per country or per group (descendant groups included).
+
+    The grid runs from 0 to ``max_setpoint``, by default the largest site maximum. With
+    ``group_id`` only the sites of that group and its descendants are considered.
+    """
+    power_columns = (
+        Site.country,
+        Site.min_power_megawatt,
+        Site.max_power_megawatt,
+        Site.useful_energy_at_1_megawatt,
+        Site.efficiency,
+    )
+    if by == EnergyCurveScope.GROUP:
+        pairs = descendant_pairs_cte([group_id] if group_id is not None else None)
+        members = (
+            select(pairs.c.root_id, site_group_association.c.site_id)
+            .join(site_group_association, site_group_association.c.group_id == pairs.c.id)
+            .distinct()
+            .subquery()
+        )
+        stmt = select(members.c.root_id, *power_columns).join(Site, Site.id == members.c.site_id)
+    else:
+        key = Site.country if by == EnergyCurveScope.COUNTRY else literal("fleet")
+        stmt = select(key, *power_columns)
+        if group_id is not None:
+            descendants = descendants_cte(group_id)
+            stmt = stmt.where(
+                select(site_group_association.c.site_id)
+                .join(descendants, descendants.c.id == site_group_association.c.group_id)
+                .where(site_group_association.c.site_id == Site.id)
+                .exists()
+            )
+
+    # One query for all the columns, the curves are computed on arrays
+    columns = site_columns((await db.execute(stmt)).all())
+    if not len(columns[0]):
+        return []
+    upper = max_setpoint or float(np.nanmax(columns[3], initial=0.0))
+    setpoints = np.linspace(0.0, upper, points)
+    curves = await curve_executor.compute(columns, setpoints)
+    return [
+        {
+            "key": key,
+            "site_count": site_count,
+            "setpoints_megawatt": setpoints.round(6).tolist(),
+            "power_megawatt": power,
+            "useful_energy": energy,
+        }
+        for key, site_count, power, energy in zip(*curves, strict=True)
+    ]
+
+
+def _change_filter(
+    entity: Optional[List[ChangeEntity]],
+    country: Optional[List[CountryEnum]],
+    group_id: Optional[List[int]],
+) -> ChangeFilter:
+    return ChangeFilter(entity, [item.value for item in country or []], group_id)
+
+
+@app.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    entity: Optional[List[ChangeEntity]] = Query(None),
+    country: Optional[List[CountryEnum]] = Query(None),
+    group_id: Optional[List[int]] = Query(None),
+    after: Optional[int] = Query(None, ge=0),
+):
+    """
+    Server-Sent Events stream of site and group changes, filtered by entity type, country
+    and group.
+
+    Every event carries its sequence number as the event id. A client that reconnects with
+    ``Last-Event-ID`` (browsers do so on their own) or ``after`` first receives the changes
+    it missed; an ``op: reset`` event means they were pruned and it has to resync.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    stream = change_feed.stream(_change_filter(entity, country, group_id), after)
+
+    async def events():
+        async with aclosing(stream):
+            async for change in stream:
+                if change is None:
+                    yield b": keep-alive\n\n"
+                else:
+                    yield b"id: %d\ndata: %s\n\n" % (change["seq"], dumps(change))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/changes/ws")
+async def changes_websocket(
+    websocket: WebSocket,
+    entity: Optional[List[ChangeEntity]] = Query(None),
+    country: Optional[List[CountryEnum]] = Query(None),
+    group_id: Optional[List[int]] = Query(None),
+    after: Optional[int] = Query(None, ge=0),
+):
+    """
+    The change stream of ``stream_changes`` as one JSON message per change; resume with
+    ``after`` set to the last ``seq`` received.
+    """
+    await websocket.accept()
+    stream = change_feed.stream(_change_filter(entity, country, group_id), after)
+
+    async def forward():
+        async with aclosing(stream):
+            async for change in stream:
+                if change is not None:
+                    await websocket.send_text(dumps(change).decode())
+        # The stream ends when the client fell too far behind; it should reconnect and resume
+        await websocket.close(code=1013)
+
+    async def drain():
+        # Client messages are ignored; receiving notices a disconnect even while idle
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(drain())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if isinstance(task.exception(), WebSocketDisconnect):
+                continue
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return read_cache.stats()
+
+
+@app.get("/snapshot/stats")
+async def read_snapshot_stats():
+    """
+    Size, freshness and memory use of this worker's fleet snapshot, by part.
+    """
+    if fleet_snapshot is None:
+        raise HTTPException(status_code=404, detail="The fleet snapshot is disabled")
+    return fleet_snapshot.stats()
+
+
+@app.get("/admission/stats")
+async def read_admission_stats():
+    """
+    Running and queued requests and rejections of each admission limit.
+    """
+    return {name: limit.stats() for name, limit in admission_limits.items()}
+
+
+@app.get("/idempotency/stats")
+async def read_idempotency_stats():
+    return idempotency_store.stats()
+
+
+@app.get("/pool/stats")
+async def read_pool_stats():
+    return engine.pool.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
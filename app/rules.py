@@ -0,0 +1,236 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.site import Site
+from app.infrastructure.quota import FR_DAILY_INSTALLATIONS, QuotaRule, reserve
+from app.schemas import CountryEnum, GroupType, SiteCreate
+
+# A site being created (id None) or updated (its current id) with the requested values
+Candidate = Tuple[Optional[int], SiteCreate]
+Facts = Dict[str, Any]
+
+
+class SiteRule:
+    """
+    A business rule applied to sites before they are written.
+
+    ``facts`` names the database facts the rule reads; they are loaded once for the whole
+    batch being checked. ``inputs`` names the site fields it reads, None standing for all of
+    them, so an update only runs the rules whose inputs it changes. Rules holding a ``quota``
+    are enforced when the sites are written, through a quota reservation, rather than by
+    ``check``.
+    """
+    facts: Tuple[str, ...] = ()
+    inputs: Optional[Tuple[str, ...]] = None
+    quota: Optional[QuotaRule] = None
+
+    def check(self, site_id: Optional[int], site: SiteCreate, facts: Facts) -> Optional[str]:
+        """
+        Returns the error message when ``site`` breaks the rule, None otherwise.
+        """
+        return None
+
+    def check_groups(self, group_ids: Sequence[int], facts: Facts) -> Optional[str]:
+        """
+        Returns the error message when joining the groups of ``group_ids`` breaks the rule,
+        None otherwise. Used when only the memberships of sites change; ``facts`` then only
+        holds ``group_types``.
+        """
+        return None
+
+
+class WeekendInstallation(SiteRule):
+    inputs = ("installation_date", "country")
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def check(self, site_id, site, facts):
+        if site.installation_date.weekday() not in (5, 6):
+            return self.message
+        return None
+
+
+class InstallationQuota(SiteRule):
+    def __init__(self, quota: QuotaRule, message: str):
+        self.quota = quota
+        self.message = message
+
+
+class UniqueName(SiteRule):
+    facts = ("site_names",)
+    inputs = ("name",)
+
+    def check(self, site_id, site, facts):
+        owner = facts["site_names"].get(site.name)
+        # Names taken by earlier sites of the same batch, whether new or updated
+        claimed = facts.setdefault("claimed_site_names", set())
+        if site.name in claimed or (owner is not None and owner != site_id):
+            return "Site name already exists"
+        claimed.add(site.name)
+        return None
+
+
+class AllowedGroups(SiteRule):
+    facts = ("group_types",)
+    inputs = ("groups",)
+
+    def __init__(self, forbidden: Set[GroupType]):
+        self.forbidden = {group_type.value for group_type in forbidden}
+
+    def check(self, site_id, site, facts):
+        return self.check_groups(site.groups or [], facts)
+
+    def check_groups(self, group_ids, facts):
+        group_types = facts["group_types"]
+        for group_id in group_ids:
+            if group_id not in group_types:
+                return f"Group with id {group_id} not found"
+            if group_types[group_id] in self.forbidden:
+                return "Sites cannot be associated with group type 'group3'."
+        return None
+
+
+async def _load_site_names(db: AsyncSession, candidates: Sequence[Candidate]) -> Dict[str, int]:
+    names = {site.name for _, site in candidates}
+    result = await db.execute(select(Site.name, Site.id).where(Site.name.in_(names)))
+    return dict(result.all())
+
+
+async def _group_types(db: AsyncSession, group_ids: Iterable[int]) -> Dict[int, str]:
+    group_ids = set(group_ids)
+    if not group_ids:
+        return {}
+    result = await db.execute(select(Group.id, Group.type).where(Group.id.in_(group_ids)))
+    return dict(result.all())
+
+
+async def _load_group_types(db: AsyncSession, candidates: Sequence[Candidate]) -> Dict[int, str]:
+    return await _group_types(
+        db, (group_id for _, site in candidates for group_id in site.groups or [])
+    )
+
+
+FACT_LOADERS: Dict[str, Callable[[AsyncSession, Sequence[Candidate]], Awaitable[Any]]] = {
+    "site_names": _load_site_names,
+    "group_types": _load_group_types,
+}
+
+
+class RuleRegistry:
+    """
+    Site rules per country, plus the rules that apply to every country.
+    """
+
+    def __init__(self):
+        self.common: List[SiteRule] = []
+        self.by_country: Dict[CountryEnum, List[SiteRule]] = {
+            country: [] for country in CountryEnum
+        }
+
+    def register(self, rule: SiteRule, *countries: CountryEnum) -> None:
+        """
+        Registers ``rule`` for the given countries, or for all of them when none is given.
+        """
+        if not countries:
+            self.common.append(rule)
+        for country in countries:
+            self.by_country[country].append(rule)
+
+    def rules_for(
+        self, country: CountryEnum, changed: Optional[Set[str]] = None
+    ) -> List[SiteRule]:
+        """
+        The rules of ``country``, or only those reading one of the ``changed`` fields.
+        """
+        rules = self.by_country[country] + self.common
+        if changed is None:
+            return rules
+        return [rule for rule in rules if rule.inputs is None or changed.intersection(rule.inputs)]
+
+    async def evaluate(
+        self,
+        db: AsyncSession,
+        candidates: Sequence[Candidate],
+        changed: Optional[Set[str]] = None,
+    ) -> Dict[int, str]:
+        """
+        Checks a batch of sites and returns the first error of each failing one, by index.
+        Updates pass the ``changed`` fields, so the rules the update cannot break are skipped.
+
+        Each fact needed by the rules in play is loaded with a single query for the whole
+        batch, whatever the number of sites or countries.
+        """
+        needed = {
+            fact
+            for country in {site.country for _, site in candidates}
+            for rule in self.rules_for(country, changed)
+            for fact in rule.facts
+        }
+        facts = {fact: await FACT_LOADERS[fact](db, candidates) for fact in sorted(needed)}
+
+        errors = {}
+        for index, (site_id, site) in enumerate(candidates):
+            for rule in self.rules_for(site.country, changed):
+                error = rule.check(site_id, site, facts)
+                if error is not None:
+                    errors[index] = error
+                    break
+        return errors
+
+    async def check_memberships(
+        self, db: AsyncSession, countries: Iterable[str], group_ids: Sequence[int]
+    ) -> Optional[str]:
+        """
+        Checks sites of ``countries`` joining the groups of ``group_ids``, whatever the number
+        of sites, with the single query loading the group types. Returns the first error.
+        """
+        rules = dict.fromkeys(
+            rule for country in sorted(set(countries)) for rule in self.rules_for(country)
+        )
+        facts = {"group_types": await _group_types(db, group_ids)}
+        for rule in rules:
+            error = rule.check_groups(group_ids, facts)
+            if error is not None:
+                return error
+        return None
+
+    async def claim_quotas(
+        self, db: AsyncSession, claims: Sequence[Tuple[int, SiteCreate]]
+    ) -> Dict[int, str]:
+        """
+        Reserves the quota slots of already flushed ``(site_id, site)`` pairs.
+
+        Returns the error for each site id that did not get its slot; the caller must not
+        commit those sites. There is one reservation round-trip per quota rule in play.
+        """
+        per_rule: Dict[SiteRule, List[Tuple[int, SiteCreate]]] = {}
+        for site_id, site in claims:
+            for rule in self.rules_for(site.country):
+                if rule.quota is not None:
+                    per_rule.setdefault(rule, []).append((site_id, site))
+
+        errors = {}
+        for rule, rule_claims in per_rule.items():
+            granted = await reserve(
+                db, rule.quota, [(site_id, site.installation_date) for site_id, site in rule_claims]
+            )
+            for site_id, _ in rule_claims:
+                if site_id not in granted:
+                    errors.setdefault(site_id, rule.message)
+        return errors
+
+
+site_rules = RuleRegistry()
+site_rules.register(
+    InstallationQuota(FR_DAILY_INSTALLATIONS, "Only one French site can be installed per day."),
+    CountryEnum.FR,
+)
+site_rules.register(
+    WeekendInstallation("Italian sites can only be installed on weekends."), CountryEnum.IT
+)
+site_rules.register(UniqueName())
+site_rules.register(AllowedGroups(forbidden={GroupType.GROUP3}))
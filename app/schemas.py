@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 from typing import List, Optional, TYPE_CHECKING
 from enum import Enum
 
@@ -16,6 +16,69 @@ class GroupType(str, Enum):
     GROUP2 = "GROUP2"
     GROUP3 = "GROUP3"
 
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+class SiteSortField(str, Enum):
+    ID = "id"
+    NAME = "name"
+    INSTALLATION_DATE = "installation_date"
+    MAX_POWER_MEGAWATT = "max_power_megawatt"
+    MIN_POWER_MEGAWATT = "min_power_megawatt"
+
+class GroupSortField(str, Enum):
+    ID = "id"
+    NAME = "name"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class CapacityDimension(str, Enum):
+    COUNTRY = "country"
+    MONTH = "month"
+    GROUP = "group"
+
+class GroupConflictKey(str, Enum):
+    ID = "id"
+    NAME = "name"
+
+class ConflictAction(str, Enum):
+    SKIP = "skip"
+    UPDATE = "update"
+
+class ChildPolicy(str, Enum):
+    RESTRICT = "restrict"
+    ORPHAN = "orphan"
+    REPARENT = "reparent"
+    CASCADE = "cascade"
+
+class ChangeEntity(str, Enum):
+    SITE = "site"
+    GROUP = "group"
+
+class ChangeOp(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class SearchMatch(str, Enum):
+    PREFIX = "prefix"
+    FUZZY = "fuzzy"
+
+class MeasurementBucket(str, Enum):
+    MINUTE = "1m"
+    FIVE_MINUTES = "5m"
+    FIFTEEN_MINUTES = "15m"
+    HOUR = "1h"
+    DAY = "1d"
+
+class EnergyCurveScope(str, Enum):
+    FLEET = "fleet"
+    COUNTRY = "country"
+    GROUP = "group"
+
 # Base Models
 class GroupBase(BaseModel):
     name: str
@@ -31,20 +94,47 @@ class SiteBase(BaseModel):
 # Create Models
 class GroupCreate(GroupBase):
     id: int
+    parent_id: Optional[int] = None
 
 class SiteCreate(SiteBase):
     useful_energy_at_1_megawatt: Optional[float] = None
     efficiency: Optional[float] = None
     groups: Optional[List[int]] = []
 
-# Response Models with ORM mode enabled
+class SiteUpdate(BaseModel):
+    name: Optional[str] = None
+    installation_date: Optional[date] = None
+    max_power_megawatt: Optional[float] = None
+    min_power_megawatt: Optional[float] = None
+    country: Optional[CountryEnum] = None
+    useful_energy_at_1_megawatt: Optional[float] = None
+    efficiency: Optional[float] = None
+    groups: Optional[List[int]] = None
+
+class GroupUpdate(BaseModel):
+    name: Optional[str] = None
+    type: Optional[GroupType] = None
+    parent_id: Optional[int] = None
+
+class MeasurementCreate(BaseModel):
+    site_id: int
+    # Naive timestamps are taken as UTC; readings are stored per minute
+    measured_at: datetime
+    power_megawatt: float
+    energy_megawatt_hour: Optional[float] = None
+
+# Response Models built from ORM attributes
 class GroupSchema(BaseModel):
     id: int
     name: str
     type: GroupType
+    parent_id: Optional[int] = None
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class GroupNode(GroupSchema):
+    depth: int
 
 class SiteSchema(BaseModel):
     id: int
@@ -52,13 +142,105 @@ class SiteSchema(BaseModel):
     installation_date: date
     max_power_megawatt: float
     min_power_megawatt: float
-    useful_energy_at_1_megawatt: float
-    efficiency: float
+    useful_energy_at_1_megawatt: Optional[float] = None
+    efficiency: Optional[float] = None
     country: CountryEnum
     groups: List[GroupSchema] = []
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+# Page Models
+class SitePage(BaseModel):
+    items: List[SiteSchema]
+    next_cursor: Optional[str] = None
+
+class GroupPage(BaseModel):
+    items: List[GroupSchema]
+    next_cursor: Optional[str] = None
+
+# Bulk Models
+class SiteBulkItemResult(BaseModel):
+    index: int
+    name: str
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class SiteBulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[SiteBulkItemResult]
+
+class GroupBulkChunkResult(BaseModel):
+    chunk: int
+    created: int
+    updated: int
+    skipped: int
+
+class GroupBulkResult(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    chunks: List[GroupBulkChunkResult]
+
+class MeasurementBulkItemError(BaseModel):
+    index: int
+    detail: str
+
+class MeasurementBulkResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[MeasurementBulkItemError]
+
+class SiteCount(BaseModel):
+    count: int
+
+class DeleteResult(BaseModel):
+    deleted: int
+    children_updated: int = 0
+
+class MembershipResult(BaseModel):
+    added: int
+    removed: int
+
+class SiteSearchHit(BaseModel):
+    id: int
+    name: str
+    country: CountryEnum
+    match: SearchMatch
+    score: float
+
+class GroupSearchHit(BaseModel):
+    id: int
+    name: str
+    type: GroupType
+    match: SearchMatch
+    score: float
+
+class MeasurementPoint(BaseModel):
+    bucket_start: datetime
+    samples: int
+    power_avg: float
+    power_min: float
+    power_max: float
+    energy_megawatt_hour: Optional[float] = None
+
+class CapacityRow(BaseModel):
+    key: str
+    site_count: int
+    max_power_megawatt: float
+    min_power_megawatt: float
+
+    class Config:
+        from_attributes = True
+
+class EnergyCurve(BaseModel):
+    key: str
+    site_count: int
+    setpoints_megawatt: List[float]
+    power_megawatt: List[float]
+    useful_energy: List[float]
 
 # ORM Models with forward references
 class Group(GroupBase):
@@ -66,7 +248,7 @@ class Group(GroupBase):
     sites: List["Site"] = []
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class Site(SiteBase):
     id: int
@@ -75,7 +257,7 @@ class Site(SiteBase):
     groups: List["Group"] = []
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 # Handle forward references
 Group.update_forward_refs()
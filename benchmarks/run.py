@@ -0,0 +1,213 @@
+"""
+Load-test and latency benchmark for the API.
+
+Seeds a synthetic fleet into a scratch Postgres database, drives every endpoint concurrently
+through an in-process ASGI client and reports throughput and p50/p95/p99 latency per route:
+
+    python -m benchmarks.run --db-url postgresql+asyncpg://user:password@db/test \\
+        --sites 10000 --groups 500 --depth 6 --fanout 2 --concurrency 16 --requests 500 \\
+        --save-baseline bench_baseline.json
+
+    python -m benchmarks.run ... --compare bench_baseline.json --threshold 0.2
+
+The target database is wiped and recreated on every run. With ``--compare`` the command exits
+with status 1 when a route's p95 latency grows, or its throughput drops, by more than
+``--threshold`` relative to the baseline.
+
+Each route runs at most as many requests at once as its admission limit runs and queues, so
+the app does not shed them; the 503s it sends anyway are reported apart from the errors and
+left out of the latencies. ``--no-admission`` turns the limits off instead.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_scenario(client, scenario, requests: int, concurrency: int, warmup: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    shed = 0
+    remaining = requests
+
+    def next_call():
+        nonlocal remaining
+        if remaining <= 0:
+            return None
+        remaining -= 1
+        try:
+            return scenario.make_call()
+        except StopIteration:
+            # The scenario ran out of data to consume (e.g. sites to delete)
+            remaining = 0
+            return None
+
+    async def send(call):
+        return await client.request(call.method, call.path, params=call.params, json=call.json)
+
+    for _ in range(0 if scenario.write else warmup):
+        await send(scenario.make_call())
+
+    async def worker():
+        nonlocal errors, shed
+        while (call := next_call()) is not None:
+            start = time.perf_counter()
+            response = await send(call)
+            # Drain streamed bodies so the export is measured end to end
+            await response.aread()
+            if response.status_code == 503:
+                shed += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "shed": shed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+
+def print_report(results: Dict[str, Dict]) -> None:
+    header = (
+        f"{'route':<40} {'reqs':>6} {'errs':>5} {'503s':>5} {'req/s':>9} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for route, r in results.items():
+        print(
+            f"{route:<40} {r['requests']:>6} {r['errors']:>5} {r['shed']:>5} "
+            f"{r['throughput']:>9.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        )
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    regressions = []
+    for route, current in results.items():
+        base = baseline.get(route)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{route}: p95 {current['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms"
+            )
+        if current["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{route}: {current['throughput']:.1f} req/s "
+                f"vs baseline {base['throughput']:.1f} req/s"
+            )
+    return regressions
+
+
+async def main(args) -> int:
+    # The app reads its database URL and settings at import time
+    os.environ["DB_URL"] = args.db_url
+    if args.no_admission:
+        os.environ["ADMISSION_ENABLED"] = "false"
+    import httpx
+
+    from app.infrastructure.models.db import engine
+    from app.main import _admission_class, admission_limits, app, read_cache, settings
+    from benchmarks.scenarios import build_scenarios
+    from benchmarks.seed import seed_fleet
+
+    # The app logs every call at DEBUG, which would dominate the measurements
+    logging.getLogger().setLevel(args.log_level)
+
+    fleet = await seed_fleet(
+        engine, args.sites, args.groups, args.depth, args.fanout, args.requests, args.seed
+    )
+    scenarios = build_scenarios(fleet, args.seed)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if args.only in scenario.route]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in scenarios:
+            if args.cold_cache:
+                read_cache.clear()
+            requests = args.export_requests if "export" in scenario.route else args.requests
+            concurrency = args.concurrency
+            method, path = scenario.route.split()[:2]
+            limit = admission_limits.get(_admission_class(method, path))
+            if settings.admission_enabled and limit is not None:
+                concurrency = min(concurrency, limit.concurrency + limit.max_queue)
+            results[scenario.route] = await run_scenario(
+                client, scenario, requests, concurrency, args.warmup
+            )
+    await engine.dispose()
+
+    print_report(results)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regression beyond the threshold")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--db-url",
+        default=os.getenv("DB_TEST_URL"),
+        help="scratch database, wiped on every run (defaults to $DB_TEST_URL)",
+    )
+    parser.add_argument("--sites", type=int, default=10000)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=6, help="levels in the group hierarchy")
+    parser.add_argument("--fanout", type=int, default=2, help="groups per site")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--export-requests", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured reads per route")
+    parser.add_argument("--cold-cache", action="store_true", help="clear the read cache per route")
+    parser.add_argument(
+        "--no-admission", action="store_true", help="run without the admission limits"
+    )
+    parser.add_argument("--only", help="only run routes containing this text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    if not args.db_url:
+        parser.error("--db-url or $DB_TEST_URL is required")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
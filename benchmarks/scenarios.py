@@ -0,0 +1,125 @@
+import itertools
+import random
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from benchmarks.seed import Fleet
+
+# Far from the seeded installation days so that new French sites get a free quota slot
+WRITE_EPOCH = date(3000, 1, 4)  # a Saturday
+
+
+class Call(NamedTuple):
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+
+
+class Scenario(NamedTuple):
+    """
+    A named request generator; ``route`` is the path template the report is keyed on.
+    """
+    route: str
+    make_call: Callable[[], Call]
+    # Read scenarios can be repeated freely, write ones are capped by the data they consume
+    write: bool = False
+
+
+def build_scenarios(fleet: Fleet, seed: int = 0) -> List[Scenario]:
+    rng = random.Random(seed)
+    counter = itertools.count(1)
+    disposable = iter(fleet.disposable_site_ids)
+
+    def new_site(country: str) -> Dict[str, Any]:
+        n = next(counter)
+        day = WRITE_EPOCH + (timedelta(days=n) if country == "FR" else timedelta(weeks=n))
+        return {
+            "name": f"bench-site-{n}",
+            "installation_date": day.isoformat(),
+            "max_power_megawatt": 10.0,
+            "min_power_megawatt": 1.0,
+            "useful_energy_at_1_megawatt": 1.0 if country == "FR" else None,
+            "efficiency": 0.9 if country == "IT" else None,
+            "country": country,
+            "groups": rng.sample(
+                fleet.assignable_group_ids, min(2, len(fleet.assignable_group_ids))
+            ),
+        }
+
+    def site_id() -> int:
+        return rng.choice(fleet.site_ids)
+
+    def group_id() -> int:
+        return rng.choice(fleet.group_ids)
+
+    def patch_site() -> Call:
+        target = site_id()
+        body = new_site("IT")
+        body["name"] = f"site-{target}"
+        return Call("PATCH", f"/sites/{target}", json=body)
+
+    def patch_group() -> Call:
+        # Send the seeded values back so the hierarchy used by the read scenarios is kept
+        target = group_id()
+        return Call("PATCH", f"/groups/{target}", json=fleet.groups[target])
+
+    def create_group() -> Call:
+        n = next(counter)
+        return Call(
+            "POST", "/groups/", json={"id": 0, "name": f"bench-group-{n}", "type": "GROUP2"}
+        )
+
+    return [
+        Scenario("GET /sites/", lambda: Call("GET", "/sites/", {"limit": 50})),
+        Scenario(
+            "GET /sites/ (filtered)",
+            lambda: Call(
+                "GET",
+                "/sites/",
+                {"country": "FR", "max_power_from": 10, "sort": "installation_date", "limit": 50},
+            ),
+        ),
+        Scenario(
+            "GET /sites/ (group filter)",
+            lambda: Call("GET", "/sites/", {"group_id": group_id(), "limit": 50}),
+        ),
+        Scenario("GET /sites/{site_id}", lambda: Call("GET", f"/sites/{site_id()}")),
+        Scenario("GET /sites/export", lambda: Call("GET", "/sites/export")),
+        Scenario("GET /groups/", lambda: Call("GET", "/groups/", {"limit": 50})),
+        Scenario("GET /groups/{group_id}", lambda: Call("GET", f"/groups/{group_id()}")),
+        Scenario(
+            "GET /groups/{group_id}/descendants",
+            lambda: Call("GET", f"/groups/{rng.choice(fleet.root_group_ids)}/descendants"),
+        ),
+        Scenario(
+            "GET /groups/{group_id}/ancestors",
+            lambda: Call("GET", f"/groups/{group_id()}/ancestors"),
+        ),
+        Scenario(
+            "GET /groups/{group_id}/sites",
+            lambda: Call(
+                "GET",
+                f"/groups/{rng.choice(fleet.root_group_ids)}/sites",
+                {"recursive": True, "limit": 50},
+            ),
+        ),
+        Scenario(
+            "POST /sites/",
+            lambda: Call("POST", "/sites/", json=new_site(rng.choice(("FR", "IT")))),
+            write=True,
+        ),
+        Scenario(
+            "POST /sites/bulk",
+            lambda: Call("POST", "/sites/bulk", json=[new_site("IT") for _ in range(100)]),
+            write=True,
+        ),
+        Scenario("PATCH /sites/{site_id}", patch_site, write=True),
+        Scenario(
+            "DELETE /sites/{site_id}",
+            lambda: Call("DELETE", f"/sites/{next(disposable)}"),
+            write=True,
+        ),
+        Scenario("POST /groups/", create_group, write=True),
+        Scenario("PATCH /groups/{group_id}", patch_group, write=True),
+    ]
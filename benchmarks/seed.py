@@ -0,0 +1,132 @@
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.infrastructure.capacity import rebuild
+from app.infrastructure.models.db import Base
+from app.infrastructure.models.group import Group
+from app.infrastructure.models.quota import QuotaReservation
+from app.infrastructure.models.site import Site, site_group_association
+from app.infrastructure.quota import FR_DAILY_INSTALLATIONS
+
+FIRST_DAY = date(2020, 1, 4)  # a Saturday
+INSERT_CHUNK = 5000
+
+
+class Fleet(NamedTuple):
+    site_ids: List[int]
+    group_ids: List[int]
+    groups: Dict[int, Dict[str, Any]]
+    root_group_ids: List[int]
+    assignable_group_ids: List[int]
+    # Sites reserved for the DELETE scenarios so that reads keep a stable data set
+    disposable_site_ids: List[int]
+
+
+async def _insert(conn, table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        await conn.execute(insert(table), rows[start:start + INSERT_CHUNK])
+
+
+async def seed_fleet(
+    engine: AsyncEngine,
+    sites: int,
+    groups: int,
+    depth: int,
+    fanout: int,
+    disposable: int,
+    seed: int = 0,
+) -> Fleet:
+    """
+    Recreates the schema and fills it with a synthetic fleet.
+
+    ``groups`` are spread evenly over ``depth`` levels, each group hanging under a random
+    group of the level above; every site joins ``fanout`` random non-group3 groups. French
+    sites get one installation day each, Italian ones are installed on weekends, so the
+    seeded data satisfies the business rules.
+    """
+    rng = random.Random(seed)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        # The name search indexes use trigram operator classes
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
+
+        group_rows = []
+        levels: List[List[int]] = [[] for _ in range(max(depth, 1))]
+        for group_id in range(1, groups + 1):
+            level = (group_id - 1) * len(levels) // groups
+            parent_id = rng.choice(levels[level - 1]) if level > 0 and levels[level - 1] else None
+            levels[level].append(group_id)
+            group_rows.append(
+                {
+                    "id": group_id,
+                    "name": f"group-{group_id}",
+                    "type": rng.choice(("GROUP1", "GROUP2", "GROUP3")),
+                    "parent_id": parent_id,
+                }
+            )
+        await _insert(conn, Group.__table__, group_rows)
+        assignable = [row["id"] for row in group_rows if row["type"] != "GROUP3"]
+
+        site_rows, reservations, memberships = [], [], []
+        total = sites + disposable
+        for site_id in range(1, total + 1):
+            country = "FR" if site_id % 2 else "IT"
+            if country == "FR":
+                installed = FIRST_DAY + timedelta(days=site_id)
+                reservations.append(
+                    {
+                        "rule": FR_DAILY_INSTALLATIONS.name,
+                        "period_start": installed,
+                        "slot": 0,
+                        "site_id": site_id,
+                    }
+                )
+            else:
+                week = rng.randrange(min(total, 2000))
+                installed = FIRST_DAY + timedelta(weeks=week, days=rng.choice((0, 1)))
+            max_power = round(rng.uniform(1, 50), 2)
+            site_rows.append(
+                {
+                    "id": site_id,
+                    "name": f"site-{site_id}",
+                    "installation_date": installed,
+                    "max_power_megawatt": max_power,
+                    "min_power_megawatt": round(max_power * rng.uniform(0.05, 0.5), 2),
+                    "useful_energy_at_1_megawatt": rng.uniform(0.5, 2) if country == "FR" else None,
+                    "efficiency": rng.uniform(0.5, 0.99) if country == "IT" else None,
+                    "country": country,
+                }
+            )
+            if assignable:
+                for group_id in rng.sample(assignable, min(fanout, len(assignable))):
+                    memberships.append({"site_id": site_id, "group_id": group_id})
+
+        await _insert(conn, Site.__table__, site_rows)
+        await _insert(conn, QuotaReservation.__table__, reservations)
+        await _insert(conn, site_group_association, memberships)
+
+        # Explicit ids leave the serial sequences behind; move them past the seeded rows
+        for table in ("sites", "groups"):
+            await conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"coalesce((SELECT max(id) FROM {table}), 0) + 1, false)"
+                )
+            )
+
+        # The rows bypassed the API, so the capacity summaries are computed in one go
+        await rebuild(conn)
+
+    return Fleet(
+        site_ids=list(range(1, sites + 1)),
+        group_ids=[row["id"] for row in group_rows],
+        groups={row["id"]: row for row in group_rows},
+        root_group_ids=levels[0],
+        assignable_group_ids=assignable,
+        disposable_site_ids=list(range(sites + 1, total + 1)),
+    )